@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class SurveyConfig(AppConfig):
     name = 'api.survey'
+
+    def ready(self) -> None:
+        from . import signals
@@ -0,0 +1,41 @@
+"""Async variants of the session-creation and answer-submission endpoints for
+ASGI deployments (``project.asgi``).
+
+The views run the same viewset actions, so validation, permissions and the
+buffered ingestion mode behave like their sync counterparts. The viewset
+work, i.e. the ORM queries and rendering, is offloaded to the shared thread
+pool of ``sync_to_async``: the event loop keeps accepting connections while
+the number of concurrent database connections stays bounded by the pool
+size instead of the number of clients."""
+from typing import Callable
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+from django.http import HttpRequest, HttpResponse
+
+from .viewsets import AnswerActViewset, SessionViewset
+
+
+def offload(view: Callable[..., HttpResponse]) -> Callable[..., HttpResponse]:
+    def run(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        # Pool threads outlive requests, so they manage their connections
+        # like request handlers do.
+        close_old_connections()
+        try:
+            response = view(request, *args, **kwargs)
+            if hasattr(response, 'render'):
+                response.render()
+            return response
+        finally:
+            close_old_connections()
+
+    async def async_view(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        return await sync_to_async(run, thread_sensitive=False)(request, *args, **kwargs)
+
+    async_view.csrf_exempt = True
+    return async_view
+
+
+session_create = offload(SessionViewset.as_view({'post': 'create'}))
+answer_create = offload(AnswerActViewset.as_view({'post': 'create'}))
+answer_bulk = offload(AnswerActViewset.as_view({'post': 'bulk'}, detail=False))
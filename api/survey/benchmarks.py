@@ -0,0 +1,137 @@
+"""Benchmarks of hot API paths.
+
+Data is seeded with the factories of the test suite, then every scenario
+issues requests through the test client, i.e. through the whole middleware
+and view stack without network, and measures requests/sec, p50/p99 latency
+and queries per request. ``manage.py benchmark`` runs them against a test
+database and writes the results as JSON, so runs of different commits can
+be compared."""
+import platform
+import subprocess
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+import django
+from django.core.cache import cache
+from django.db import connection
+from django.test.client import Client
+
+from .models import ActiveSurveyModel, QuestionModel, SessionModel, SurveyModel
+from .tests.utils import (
+    create_test_actors_via_model, create_test_answer_acts_via_model,
+    create_test_sessions_via_model,
+    create_test_surveys_questions_and_response_options_via_model,
+    request_with_query_stats,)
+
+# Request of a scenario: method, path and keyword arguments of the client.
+Request = Tuple[str, str, dict]
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, round(fraction * (len(values) - 1)))]
+
+
+def get_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+            check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Benchmark:
+    def __init__(self, scale: int = 10, questions: int = 3, responses: int = 3,
+                 sessions: int = 100, requests: int = 200, warmup: int = 20) -> None:
+        self.scale = scale
+        self.questions = questions
+        self.responses = responses
+        self.sessions = sessions
+        self.requests = requests
+        self.warmup = warmup
+        self.client = Client()
+
+    def seed(self) -> None:
+        """Seeds ``scale`` times the surveys of the test suite with their
+        questions and response options, and answers of ``sessions`` sessions
+        to every published survey."""
+        for _ in range(self.scale):
+            create_test_surveys_questions_and_response_options_via_model(
+                number_of_questions=self.questions, number_of_responses=self.responses)
+        self.actor = create_test_actors_via_model(1)[0]
+        sessions = create_test_sessions_via_model(self.actor, self.sessions)
+        for survey in SurveyModel.objects.published():
+            create_test_answer_acts_via_model(
+                sessions, survey.questions.filter(type='many').first().response_options.all())
+
+        self.survey = SurveyModel.objects.published().first()
+        self.question = QuestionModel.objects.published().filter(
+            survey=self.survey, type='many').first()
+        self.response_option = self.question.response_options.first()
+
+    def get_scenarios(self) -> Dict[str, Callable[[], Request]]:
+        def answer_create() -> Request:
+            # Answers are unique per session, so every request gets its own.
+            session = SessionModel.objects.create(actor=self.actor)
+            return ('post', '/api/v1/answers/', {'data': {
+                'session': session.pk, 'response': self.response_option.pk}})
+
+        return {
+            'survey-list': lambda: ('get', '/api/v1/surveys/', {}),
+            'survey-retrieve': lambda: ('get', f'/api/v1/surveys/{self.survey.pk}/', {}),
+            'question-retrieve': lambda: (
+                'get', f'/api/v1/questions/{self.question.pk}/', {}),
+            'session-create': lambda: (
+                'post', '/api/v1/sessions/', {'data': {'actor': self.actor.pk}}),
+            'answer-create': answer_create,
+        }
+
+    def measure(self, make_request: Callable[[], Request]) -> dict:
+        for _ in range(self.warmup):
+            method, path, kwargs = make_request()
+            getattr(self.client, method)(path=path, **kwargs)
+
+        latencies: List[float] = []
+        queries: List[int] = []
+        errors = 0
+        for _ in range(self.requests):
+            method, path, kwargs = make_request()
+            start = time.perf_counter()
+            response, stats = request_with_query_stats(self.client, method, path, **kwargs)
+            latencies.append(time.perf_counter() - start)
+            queries.append(stats.queries)
+            errors += response.status_code >= 400
+
+        return {
+            'requests': self.requests,
+            'errors': errors,
+            'rps': round(len(latencies) / sum(latencies), 1),
+            'p50_ms': round(percentile(latencies, 0.5) * 1000, 3),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+            'queries_mean': round(sum(queries) / len(queries), 2),
+            'queries_max': max(queries),
+        }
+
+    def run(self, scenarios: Optional[List[str]] = None) -> dict:
+        cache.clear()
+        self.seed()
+        ActiveSurveyModel.invalidate()
+        results = {
+            name: self.measure(make_request)
+            for name, make_request in self.get_scenarios().items()
+            if scenarios is None or name in scenarios}
+        return {
+            'revision': get_revision(),
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'environment': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor, },
+            'parameters': {
+                'scale': self.scale, 'questions': self.questions,
+                'responses': self.responses, 'sessions': self.sessions,
+                'requests': self.requests, 'warmup': self.warmup, },
+            'results': results,
+        }
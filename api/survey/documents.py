@@ -0,0 +1,74 @@
+"""Read-through cache of rendered survey documents.
+
+Documents are keyed by survey pk, a content version of the survey and the
+serializer which rendered them. Saving or deleting a survey, its question or
+its response option bumps the version (see ``signals``), so stale documents
+are never read and just expire. Versions are kept in the cache, so this holds
+for all processes only when they share it (see ``CACHES``)."""
+import time
+from typing import Callable, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpRequest
+
+
+def get_version_key(survey_pk) -> str:
+    return f'survey:{survey_pk}:version'
+
+
+def get_version(survey_pk) -> Optional[int]:
+    return cache.get(get_version_key(survey_pk))
+
+
+def invalidate(survey_pk) -> None:
+    # A new version is set rather than incremented, increments of some
+    # shared backends (e.g. the file based one) aren't atomic. Versions
+    # expire along with their documents.
+    cache.set(
+        get_version_key(survey_pk), time.time_ns(),
+        settings.SURVEY_DOCUMENT_CACHE_TIMEOUT)
+
+
+def invalidate_on_commit(survey_pk) -> None:
+    # Invalidated twice, so documents rendered by other processes before the
+    # commit are not cached under the final version.
+    invalidate(survey_pk)
+    transaction.on_commit(lambda: invalidate(survey_pk))
+
+
+def get_document_key(survey_pk, version: int, request: HttpRequest, name: str) -> str:
+    # Documents contain absolute hyperlinks, so they depend on the host.
+    base_url = request.build_absolute_uri('/')
+    return f'survey:{survey_pk}:v{version}:{name}:{base_url}'
+
+
+def get_document(survey_pk, request: HttpRequest, name: str,
+                 render: Callable[[], dict]) -> dict:
+    """Returns cached document ``name`` of the survey or caches the one
+    returned by ``render``. The document is a dict of rendered ``data`` and
+    the survey state it was rendered from, e.g. publication dates.
+
+    A missing version is set once the survey is rendered, so requests of
+    surveys which don't exist don't fill the cache."""
+    version = get_version(survey_pk)
+    if version is not None:
+        document: Optional[dict] = cache.get(
+            get_document_key(survey_pk, version, request, name))
+        if document is not None:
+            return document
+    document = render()
+    if version is None:
+        # Time based initial version can't match documents cached before
+        # the version was evicted. If the survey was invalidated meanwhile,
+        # the document may be stale, so it isn't cached.
+        version = time.time_ns()
+        if not cache.add(
+                get_version_key(survey_pk), version,
+                settings.SURVEY_DOCUMENT_CACHE_TIMEOUT):
+            return document
+    cache.set(
+        get_document_key(survey_pk, version, request, name), document,
+        settings.SURVEY_DOCUMENT_CACHE_TIMEOUT)
+    return document
@@ -0,0 +1,249 @@
+"""Write-behind ingestion of answer acts.
+
+With ``ANSWER_INGESTION['MODE'] = 'buffered'`` validated answers are appended
+to a journal in a local SQLite file and the request is answered with 202 once
+the journal transaction is committed: accepted answers survive a crash of the
+process. A background thread inserts them in batches every ``FLUSH_INTERVAL``
+seconds or as soon as ``BATCH_SIZE`` answers are pending, and the rest is
+flushed on interpreter shutdown. ``manage.py flush_answers`` drains a journal
+left by a killed process.
+
+Answers are inserted per session with ``AnswerActModel.bulk_create_for_session``.
+Answers which exceed the number of answers of their question, or reference
+deleted objects, are kept in the journal as rejected. Rows are claimed for a
+lease before insertion, so rows of a crashed flush are retried; the unique
+constraints of answers make the retry idempotent, and answers which the
+crashed flush inserted are found identical and counted as inserted."""
+import atexit
+import logging
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import connections
+
+from .models import AnswerActModel, ResponseOptionModel, SessionModel
+from .utils.exceptions import NumberExcess
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+REJECTED = 'rejected'
+
+
+def get_settings() -> dict:
+    return {
+        'MODE': 'direct',
+        'JOURNAL': 'answers-journal.sqlite3',
+        'BATCH_SIZE': 500,
+        'FLUSH_INTERVAL': 1.0,
+        'LEASE': 60.0,
+        **getattr(settings, 'ANSWER_INGESTION', {}), }
+
+
+def is_buffered() -> bool:
+    return get_settings()['MODE'] == 'buffered'
+
+
+class AnswerBuffer:
+    def __init__(self, journal: str, batch_size: int,
+                 flush_interval: Optional[float], lease: float) -> None:
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.lease = lease
+        self.pending = 0
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        self.closed = False
+
+        self.journal = sqlite3.connect(
+            journal, timeout=30, isolation_level=None, check_same_thread=False)
+        self.journal.execute('PRAGMA journal_mode=WAL')
+        self.journal.execute('PRAGMA synchronous=FULL')
+        self.journal.execute(
+            'CREATE TABLE IF NOT EXISTS answers ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+            'session TEXT NOT NULL, '
+            'response INTEGER NOT NULL, '
+            'content TEXT, '
+            'accepted_at REAL NOT NULL, '
+            f"state TEXT NOT NULL DEFAULT '{PENDING}', "
+            'claimed_until REAL)')
+
+    @contextmanager
+    def journal_transaction(self):
+        with self.lock:
+            self.journal.execute('BEGIN IMMEDIATE')
+            try:
+                yield self.journal
+            except BaseException:
+                self.journal.execute('ROLLBACK')
+                raise
+            self.journal.execute('COMMIT')
+
+    def append(self, answer_acts: Iterable[AnswerActModel]) -> int:
+        """Journals ``answer_acts`` and returns their number. Answers are
+        durable when it returns."""
+        now = time.time()
+        rows = [
+            (str(answer_act.session_id), answer_act.response_id, answer_act.content, now)
+            for answer_act in answer_acts]
+        with self.journal_transaction() as journal:
+            journal.executemany(
+                'INSERT INTO answers (session, response, content, accepted_at) '
+                'VALUES (?, ?, ?, ?)', rows)
+            self.pending += len(rows)
+            is_full = self.pending >= self.batch_size
+
+        if self.flush_interval is None:
+            if is_full:
+                self.flush()
+        else:
+            self.start()
+            if is_full:
+                self.wakeup.set()
+        return len(rows)
+
+    def claim(self) -> List[Tuple[int, str, int, Optional[str]]]:
+        now = time.time()
+        with self.journal_transaction() as journal:
+            rows = journal.execute(
+                'SELECT id, session, response, content FROM answers '
+                'WHERE state = ? AND (claimed_until IS NULL OR claimed_until < ?) '
+                'ORDER BY id LIMIT ?', (PENDING, now, self.batch_size)).fetchall()
+            journal.executemany(
+                'UPDATE answers SET claimed_until = ? WHERE id = ?',
+                [(now + self.lease, row[0]) for row in rows])
+        return rows
+
+    def flush(self) -> Tuple[int, int]:
+        """Inserts one batch of pending answers. Returns numbers of inserted
+        and rejected answers."""
+        with self.flush_lock:
+            rows = self.claim()
+            if not rows:
+                with self.lock:
+                    self.pending = 0
+                return 0, 0
+
+            sessions = SessionModel.objects.in_bulk({row[1] for row in rows})
+            response_options = ResponseOptionModel.objects.in_bulk({row[2] for row in rows})
+            rows_by_session: Dict[str, list] = defaultdict(list)
+            for row in rows:
+                rows_by_session[row[1]].append(row)
+
+            inserteds, rejecteds = [], []
+            for session_pk, session_rows in rows_by_session.items():
+                session = sessions.get(SessionModel._meta.pk.to_python(session_pk))
+                answers = []
+                for pk, _, response, content in session_rows:
+                    if session is None or response not in response_options:
+                        rejecteds.append(pk)
+                    else:
+                        answers.append((pk, AnswerActModel(
+                            response=response_options[response], content=content)))
+                if answers:
+                    self.insert(session, answers, inserteds, rejecteds)
+
+            with self.journal_transaction() as journal:
+                journal.executemany(
+                    'DELETE FROM answers WHERE id = ?', [(pk,) for pk in inserteds])
+                journal.executemany(
+                    'UPDATE answers SET state = ? WHERE id = ?',
+                    [(REJECTED, pk) for pk in rejecteds])
+                self.pending = max(self.pending - len(rows), 0)
+            return len(inserteds), len(rejecteds)
+
+    @staticmethod
+    def insert(session: SessionModel, answers: List[Tuple[int, AnswerActModel]],
+               inserteds: List[int], rejecteds: List[int]) -> None:
+        try:
+            AnswerActModel.bulk_create_for_session(
+                session, [answer_act for _, answer_act in answers])
+            inserteds.extend(pk for pk, _ in answers)
+            return
+        except NumberExcess:
+            pass
+        # Some answers exceed the limits, so they are sorted out one by one.
+        for pk, answer_act in answers:
+            answer_act.session = session
+            try:
+                answer_act.save()
+                inserteds.append(pk)
+            except NumberExcess:
+                if AnswerActModel.objects.filter(
+                        session=session, response=answer_act.response_id,
+                        content=answer_act.content).exists():
+                    # Inserted by a flush which crashed before the journal
+                    # was updated.
+                    inserteds.append(pk)
+                else:
+                    rejecteds.append(pk)
+
+    def flush_all(self) -> Tuple[int, int]:
+        inserted, rejected = 0, 0
+        while True:
+            batch_inserted, batch_rejected = self.flush()
+            if not batch_inserted and not batch_rejected:
+                return inserted, rejected
+            inserted += batch_inserted
+            rejected += batch_rejected
+
+    def start(self) -> None:
+        with self.lock:
+            if self.thread is not None or self.closed:
+                return
+            self.thread = threading.Thread(
+                target=self.run, name='answer-ingestion', daemon=True)
+            self.thread.start()
+
+    def run(self) -> None:
+        while not self.closed:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            try:
+                self.flush_all()
+            except Exception:
+                # Claimed answers are retried when their lease expires.
+                logger.exception('Flush of answers failed.')
+            finally:
+                connections.close_all()
+
+    def count(self, state: str = PENDING) -> int:
+        return self.journal.execute(
+            'SELECT COUNT(*) FROM answers WHERE state = ?', (state,)).fetchone()[0]
+
+    def close(self) -> None:
+        """Stops the flushing thread and flushes the rest of the journal."""
+        self.closed = True
+        self.wakeup.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.flush_all()
+        self.journal.close()
+
+
+buffers: Dict[str, AnswerBuffer] = {}
+buffers_lock = threading.Lock()
+
+
+def get_buffer() -> AnswerBuffer:
+    options = get_settings()
+    with buffers_lock:
+        if options['JOURNAL'] not in buffers:
+            buffers[options['JOURNAL']] = AnswerBuffer(
+                options['JOURNAL'], options['BATCH_SIZE'],
+                options['FLUSH_INTERVAL'], options['LEASE'])
+        return buffers[options['JOURNAL']]
+
+
+@atexit.register
+def close_buffers() -> None:
+    for buffer in buffers.values():
+        buffer.close()
@@ -0,0 +1,84 @@
+import json
+import logging
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import (
+    override_settings, setup_databases, setup_test_environment,
+    teardown_databases, teardown_test_environment,)
+
+from ...benchmarks import Benchmark
+
+
+class Command(BaseCommand):
+    help = ('Seeds a test database and measures requests/sec, p50/p99 latency '
+            'and queries per request of the hot API paths.')
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            '--scale', type=int, default=10,
+            help='Number of times the test surveys are seeded, 8 surveys each.')
+        parser.add_argument(
+            '--questions', type=int, default=3,
+            help='Number of questions of every type per survey.')
+        parser.add_argument(
+            '--responses', type=int, default=3,
+            help='Number of response options per question.')
+        parser.add_argument(
+            '--sessions', type=int, default=100,
+            help='Number of sessions which answered every published survey.')
+        parser.add_argument(
+            '--requests', type=int, default=200, help='Measured requests per scenario.')
+        parser.add_argument(
+            '--warmup', type=int, default=20, help='Unmeasured requests per scenario.')
+        parser.add_argument(
+            '--scenario', action='append', dest='scenarios', default=None,
+            help='Scenario to run, all by default. Can be repeated.')
+        parser.add_argument(
+            '--output', default='benchmark.json', help='File to write results as JSON to.')
+        parser.add_argument(
+            '--compare', default=None,
+            help='Results of a previous run to print the changes against.')
+
+    def handle(self, *args, **options) -> None:
+        for name in ('scale', 'questions', 'requests'):
+            if options[name] < 1:
+                raise CommandError(f'--{name} must be positive.')
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as file:
+                    baseline = json.load(file)['results']
+            except (OSError, ValueError, KeyError) as e:
+                raise CommandError(f'Results to compare can\'t be read: {e}')
+
+        benchmark = Benchmark(
+            scale=options['scale'], questions=options['questions'],
+            responses=options['responses'], sessions=options['sessions'],
+            requests=options['requests'], warmup=options['warmup'])
+        # Per-request stats would flood the output.
+        logging.getLogger('api.survey.utils.middleware').setLevel(logging.WARNING)
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            # The benchmark clears the cache, the shared one is left alone.
+            with override_settings(CACHES={'default': {
+                    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+                report = benchmark.run(options['scenarios'])
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        for name, result in report['results'].items():
+            line = (f'{name:<18} {result["rps"]:>9.1f} rps  p50={result["p50_ms"]:.2f}ms  '
+                    f'p99={result["p99_ms"]:.2f}ms  queries={result["queries_mean"]}')
+            if baseline and name in baseline:
+                line += '  ({:+.1%} rps, {:+.2f} queries)'.format(
+                    result['rps'] / baseline[name]['rps'] - 1,
+                    result['queries_mean'] - baseline[name]['queries_mean'])
+            if result['errors']:
+                line += f'  {result["errors"]} errors'
+            self.stdout.write(line)
+
+        with open(options['output'], 'w') as file:
+            json.dump(report, file, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'Results are written to {options["output"]}.'))
@@ -0,0 +1,69 @@
+import time
+from typing import Optional
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection, transaction
+
+from ...models import ActorModel
+from ...utils.keys import generators
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Compares insert rate and primary key index size of actors keyed by '
+            'UUID versions 4 and 7. Rows are inserted on top of the existing '
+            'table and rolled back.')
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            '--rows', type=int, default=100_000, help='Number of rows to insert per version.')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000, help='Number of rows per INSERT.')
+
+    def handle(self, *args, **options) -> None:
+        for version, generate in sorted(generators.items()):
+            try:
+                with transaction.atomic():
+                    elapsed = self.insert(generate, options['rows'], options['batch_size'])
+                    index_size = self.get_pk_index_size()
+                    raise Rollback
+            except Rollback:
+                pass
+            size = 'n/a' if index_size is None else f'{index_size / 2 ** 20:.1f} MiB'
+            self.stdout.write(
+                f'uuid{version}: {options["rows"] / elapsed:.0f} rows/s, '
+                f'primary key index {size}')
+        self.stdout.write(self.style.SUCCESS('Benchmark finished.'))
+
+    @staticmethod
+    def insert(generate, rows: int, batch_size: int) -> float:
+        start = time.perf_counter()
+        for offset in range(0, rows, batch_size):
+            ActorModel.objects.bulk_create(
+                ActorModel(unique_key=generate())
+                for _ in range(min(batch_size, rows - offset)))
+        return time.perf_counter() - start
+
+    @staticmethod
+    def get_pk_index_size() -> Optional[int]:
+        table = ActorModel._meta.db_table
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(
+                    'SELECT pg_relation_size(indexrelid) FROM pg_index '
+                    'WHERE indrelid = %s::regclass AND indisprimary', [table])
+            elif connection.vendor == 'sqlite':
+                try:
+                    cursor.execute(
+                        'SELECT SUM(pgsize) FROM dbstat WHERE name = %s',
+                        [f'sqlite_autoindex_{table}_1'])
+                except DatabaseError:
+                    # SQLite is built without the dbstat virtual table.
+                    return None
+            else:
+                return None
+            row = cursor.fetchone()
+        return row[0] if row else None
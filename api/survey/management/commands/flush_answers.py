@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from ... import ingestion
+
+
+class Command(BaseCommand):
+    help = 'Inserts answers pending in the journal of buffered ingestion.'
+
+    def handle(self, *args, **options) -> None:
+        buffer = ingestion.get_buffer()
+        inserted, rejected = buffer.flush_all()
+        self.stdout.write(self.style.SUCCESS(
+            f'Inserted {inserted} and rejected {rejected} answers, '
+            f'{buffer.count(ingestion.REJECTED)} rejected answers are kept in the journal.'))
@@ -0,0 +1,147 @@
+import random
+import time
+from datetime import date, timedelta
+from typing import Dict, List, Tuple
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+
+from ...models import (
+    ActiveSurveyModel, ActorModel, AnswerActModel, QuestionModel,
+    ResponseOptionModel, SessionModel, SurveyModel,)
+
+# Options of a question: pk, type and pks of its response options.
+Question = Tuple[int, str, List[int]]
+
+
+class Command(BaseCommand):
+    help = ('Generates published surveys with questions and response options, '
+            'and actors with sessions answering them, using batched inserts. '
+            'Counters and the set of active surveys are rebuilt afterwards. '
+            'Run it on a database nobody writes to meanwhile.')
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('--surveys', type=int, default=10)
+        parser.add_argument(
+            '--questions', type=int, default=10,
+            help='Number of questions per survey, their types alternate one/many/text.')
+        parser.add_argument(
+            '--responses', type=int, default=4,
+            help='Number of response options per one/many question.')
+        parser.add_argument('--actors', type=int, default=1000)
+        parser.add_argument('--sessions', type=int, default=1, help='Number of sessions per actor.')
+        parser.add_argument(
+            '--batch-size', type=int, default=10000, help='Number of rows per INSERT.')
+        parser.add_argument('--seed', type=int, default=None, help='Seed of the random generator.')
+
+    def handle(self, *args, **options) -> None:
+        for name in ('surveys', 'questions', 'responses', 'actors', 'sessions', 'batch_size'):
+            if options[name] < 1:
+                raise CommandError(f'--{name.replace("_", "-")} must be positive.')
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        start = time.perf_counter()
+
+        with transaction.atomic():
+            surveys = self.create_surveys(
+                options['surveys'], options['questions'], options['responses'])
+        answers = 0
+        actors = options['actors']
+        # Actors are generated in chunks, so their answers fit in batches.
+        chunk = max(1, self.batch_size // (options['sessions'] * options['questions']))
+        for offset in range(0, actors, chunk):
+            with transaction.atomic():
+                answers += self.create_respondents(
+                    min(chunk, actors - offset), options['sessions'], surveys)
+
+        call_command('rebuild_counters', stdout=self.stdout)
+        ActiveSurveyModel.refresh()
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {options["surveys"]} surveys, {actors} actors, '
+            f'{actors * options["sessions"]} sessions and {answers} answers '
+            f'in {time.perf_counter() - start:.1f}s.'))
+
+    @staticmethod
+    def get_next_pk(model) -> int:
+        return (model.objects.aggregate(Max('pk'))['pk__max'] or 0) + 1
+
+    def create_surveys(self, number: int, questions_number: int, responses_number: int) \
+            -> Dict[int, List[Question]]:
+        """Inserts surveys, questions and response options with explicit pks,
+        so their relations are known without fetching inserted rows back."""
+        types = [QuestionModel.TYPES.ONE, QuestionModel.TYPES.MANY, QuestionModel.TYPES.TEXT]
+        survey_pk = self.get_next_pk(SurveyModel)
+        question_pk = self.get_next_pk(QuestionModel)
+        option_pk = self.get_next_pk(ResponseOptionModel)
+        today = date.today()
+
+        surveys, questions, options = [], [], []
+        structure: Dict[int, List[Question]] = {}
+        for _ in range(number):
+            surveys.append(SurveyModel(
+                pk=survey_pk,
+                header=f'Generated survey #{survey_pk}',
+                description='Generated survey',
+                begin_date=today - timedelta(days=self.random.randint(0, 30)),
+                end_date=today + timedelta(days=self.random.randint(1, 60))))
+            structure[survey_pk] = []
+            for i in range(questions_number):
+                type = types[i % len(types)]
+                questions.append(QuestionModel(
+                    pk=question_pk, survey_id=survey_pk, type=type,
+                    content=f'Generated question #{question_pk} (type:{type})'))
+                # Text questions have their single fake response option.
+                contents = ['fake_answer'] if type == QuestionModel.TYPES.TEXT else [
+                    f'Answer #{j} for question #{question_pk}' for j in range(responses_number)]
+                option_pks = []
+                for content in contents:
+                    options.append(ResponseOptionModel(
+                        pk=option_pk, question_id=question_pk,
+                        question_type=type, content=content))
+                    option_pks.append(option_pk)
+                    option_pk += 1
+                structure[survey_pk].append((question_pk, type, option_pks))
+                question_pk += 1
+            survey_pk += 1
+
+        SurveyModel.objects.bulk_create(surveys, batch_size=self.batch_size)
+        QuestionModel.objects.bulk_create(questions, batch_size=self.batch_size)
+        ResponseOptionModel.objects.bulk_create(options, batch_size=self.batch_size)
+        # Sequences of backends like PostgreSQL don't know about explicit pks.
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(
+                    no_style(), [SurveyModel, QuestionModel, ResponseOptionModel]):
+                cursor.execute(sql)
+        return structure
+
+    def create_respondents(self, actors_number: int, sessions_number: int,
+                           surveys: Dict[int, List[Question]]) -> int:
+        """Inserts actors with sessions, every session answers all questions
+        of a random survey: one response option of one and text questions and
+        a non-empty subset of response options of many questions."""
+        actors = [ActorModel() for _ in range(actors_number)]
+        sessions = [
+            SessionModel(actor=actor) for actor in actors for _ in range(sessions_number)]
+        survey_pks = list(surveys)
+        answers = []
+        for session in sessions:
+            for question_pk, type, option_pks in surveys[self.random.choice(survey_pks)]:
+                if type == QuestionModel.TYPES.MANY:
+                    chosens = self.random.sample(
+                        option_pks, self.random.randint(1, len(option_pks)))
+                else:
+                    chosens = [self.random.choice(option_pks)]
+                for option_pk in chosens:
+                    answers.append(AnswerActModel(
+                        session_id=session.pk, response_id=option_pk,
+                        question_id=question_pk, question_type=type,
+                        content=f'Generated answer of {session.pk}'
+                        if type == QuestionModel.TYPES.TEXT else None))
+
+        ActorModel.objects.bulk_create(actors, batch_size=self.batch_size)
+        SessionModel.objects.bulk_create(sessions, batch_size=self.batch_size)
+        AnswerActModel.objects.bulk_create(answers, batch_size=self.batch_size)
+        return len(answers)
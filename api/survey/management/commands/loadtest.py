@@ -0,0 +1,166 @@
+import asyncio
+import json
+import time
+from typing import List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+def percentile(latencies: List[float], fraction: float) -> Optional[float]:
+    if not latencies:
+        return None
+    return latencies[min(len(latencies) - 1, round(fraction * (len(latencies) - 1)))]
+
+
+class Client:
+    """Minimal HTTP/1.1 client, one connection per request."""
+
+    def __init__(self, base_url: str, timeout: float) -> None:
+        parts = urlsplit(base_url)
+        if parts.scheme != 'http' or not parts.hostname:
+            raise CommandError(f'"{base_url}" is not an http:// URL.')
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.netloc = parts.netloc
+        self.prefix = parts.path.rstrip('/')
+        self.timeout = timeout
+
+    async def post(self, path: str, data: dict) -> Tuple[int, Optional[dict]]:
+        return await asyncio.wait_for(self.request(path, data), self.timeout)
+
+    async def request(self, path: str, data: dict) -> Tuple[int, Optional[dict]]:
+        body = json.dumps(data).encode()
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            writer.write(
+                f'POST {self.prefix}{path} HTTP/1.1\r\n'
+                f'Host: {self.netloc}\r\n'
+                'Content-Type: application/json\r\n'
+                'Accept: application/json\r\n'
+                f'Content-Length: {len(body)}\r\n'
+                'Connection: close\r\n\r\n'.encode() + body)
+            await writer.drain()
+            raw = await reader.read()
+        finally:
+            writer.close()
+        head, _, content = raw.partition(b'\r\n\r\n')
+        lines = head.decode('latin-1').split('\r\n')
+        status = int(lines[0].split()[1])
+        if 'transfer-encoding: chunked' in (line.lower() for line in lines[1:]):
+            content = self.dechunk(content)
+        try:
+            return status, json.loads(content)
+        except ValueError:
+            return status, None
+
+    @staticmethod
+    def dechunk(content: bytes) -> bytes:
+        chunks = []
+        while content:
+            size, _, content = content.partition(b'\r\n')
+            size = int(size.split(b';')[0], 16)
+            if not size:
+                break
+            chunks.append(content[:size])
+            content = content[size + 2:]
+        return b''.join(chunks)
+
+
+class Command(BaseCommand):
+    help = ('Measures throughput and latency of session creation and answer '
+            'submission of a running server with growing numbers of concurrent '
+            'connections. Run it against a WSGI server (e.g. gunicorn '
+            'project.wsgi) with "--mode sync" and an ASGI server (e.g. uvicorn '
+            'project.asgi:application) with "--mode async" on the same hardware '
+            'to compare their connection capacity.')
+
+    paths = {'sync': '/api/v1/', 'async': '/api/v1/async/'}
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument('url', help='Base URL of the server, e.g. http://127.0.0.1:8000.')
+        parser.add_argument(
+            '--mode', choices=sorted(self.paths), default='sync',
+            help='Endpoints to load, the viewsets or their async variants.')
+        parser.add_argument(
+            '--scenario', choices=('sessions', 'answers'), default='sessions',
+            help='Create sessions, or create a session and answer it per iteration.')
+        parser.add_argument(
+            '--response', type=int, default=None,
+            help='Pk of the response option to answer, required by the answers scenario.')
+        parser.add_argument(
+            '--concurrency', default='10,100',
+            help='Comma separated numbers of concurrent connections, one step each.')
+        parser.add_argument(
+            '--duration', type=float, default=10.0, help='Seconds of every step.')
+        parser.add_argument(
+            '--timeout', type=float, default=30.0, help='Seconds to wait for a response.')
+        parser.add_argument(
+            '--output', default=None, help='File to write results as JSON to.')
+
+    def handle(self, *args, **options) -> None:
+        if options['scenario'] == 'answers' and options['response'] is None:
+            raise CommandError('The answers scenario requires --response.')
+        try:
+            levels = [int(level) for level in options['concurrency'].split(',')]
+        except ValueError:
+            raise CommandError('--concurrency must be comma separated integers.')
+
+        results = asyncio.run(self.run(levels, options))
+        for result in results:
+            self.stdout.write(
+                '{concurrency:>6} connections: {requests} requests, {errors} errors, '
+                '{rps:.1f} rps, p50={p50_ms}ms, p99={p99_ms}ms'.format(**result))
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump({
+                    'url': options['url'], 'mode': options['mode'],
+                    'scenario': options['scenario'], 'results': results, }, file, indent=2)
+        self.stdout.write(self.style.SUCCESS('Load test finished.'))
+
+    async def run(self, levels: List[int], options: dict) -> List[dict]:
+        client = Client(options['url'], options['timeout'])
+        status, actor = await client.post('/api/v1/actors/', {})
+        if status != 201:
+            raise CommandError(f'Creation of an actor failed with status {status}.')
+        return [await self.step(client, actor['pk'], level, options) for level in levels]
+
+    async def step(self, client: Client, actor, concurrency: int, options: dict) -> dict:
+        path = self.paths[options['mode']]
+        deadline = time.perf_counter() + options['duration']
+        latencies: List[float] = []
+        errors = 0
+
+        async def post(endpoint: str, data: dict) -> Optional[dict]:
+            nonlocal errors
+            start = time.perf_counter()
+            try:
+                status, content = await client.post(path + endpoint, data)
+            except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+                status, content = None, None
+            latencies.append(time.perf_counter() - start)
+            if status is None or status >= 400:
+                errors += 1
+                return None
+            return content
+
+        async def worker() -> None:
+            while time.perf_counter() < deadline:
+                session = await post('sessions/', {'actor': actor})
+                if session is not None and options['scenario'] == 'answers':
+                    await post('answers/', {
+                        'session': session['pk'], 'response': options['response']})
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+        latencies.sort()
+        p50, p99 = percentile(latencies, 0.5), percentile(latencies, 0.99)
+        return {
+            'concurrency': concurrency,
+            'requests': len(latencies),
+            'errors': errors,
+            'rps': len(latencies) / elapsed,
+            'p50_ms': None if p50 is None else round(p50 * 1000, 2),
+            'p99_ms': None if p99 is None else round(p99 * 1000, 2), }
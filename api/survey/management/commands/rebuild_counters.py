@@ -0,0 +1,70 @@
+from typing import Dict
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count
+
+from ...models import (
+    AnswerActModel, ResponseOptionCounterModel, ResponseOptionModel,
+    SurveyCounterModel, SurveyModel, SurveySessionModel,)
+
+
+class Command(BaseCommand):
+    help = ('Rebuilds answer counters of response options, session counters of surveys '
+            'and sessions marked as answerers of surveys from answers.')
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Only compare counters with answers and fail on mismatch.')
+
+    def handle(self, *args, **options) -> None:
+        with transaction.atomic():
+            answers: Dict[int, int] = dict.fromkeys(
+                ResponseOptionModel.objects.values_list('pk', flat=True), 0)
+            answers.update(
+                AnswerActModel.objects.order_by().values('response')
+                .annotate(number=Count('pk')).values_list('response', 'number'))
+            sessions: Dict[int, int] = dict.fromkeys(
+                SurveyModel.objects.values_list('pk', flat=True), 0)
+            sessions.update(
+                AnswerActModel.objects.order_by().values('question__survey')
+                .annotate(number=Count('session', distinct=True))
+                .values_list('question__survey', 'number'))
+
+            pairs = AnswerActModel.objects.order_by().values_list(
+                'session', 'question__survey').distinct()
+
+            if options['verify']:
+                self.verify(ResponseOptionCounterModel, 'answers', answers)
+                self.verify(SurveyCounterModel, 'sessions', sessions)
+                if set(SurveySessionModel.objects.values_list('session', 'survey')) != set(pairs):
+                    raise CommandError('answering sessions mismatch')
+                self.stdout.write(self.style.SUCCESS('Counters are consistent.'))
+                return
+
+            ResponseOptionCounterModel.objects.all().delete()
+            ResponseOptionCounterModel.objects.bulk_create([
+                ResponseOptionCounterModel(response_option_id=pk, answers=number)
+                for pk, number in answers.items()])
+            SurveyCounterModel.objects.all().delete()
+            SurveyCounterModel.objects.bulk_create([
+                SurveyCounterModel(survey_id=pk, sessions=number)
+                for pk, number in sessions.items()])
+            SurveySessionModel.objects.all().delete()
+            SurveySessionModel.objects.bulk_create(
+                (SurveySessionModel(session_id=session, survey_id=survey)
+                 for session, survey in pairs.iterator()),
+                batch_size=1000)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {len(answers)} response option and {len(sessions)} survey counters.'))
+
+    def verify(self, model, field: str, expecteds: Dict[int, int]) -> None:
+        counters = dict(model.objects.values_list('pk', field))
+        if counters != expecteds:
+            mismatches = sorted(
+                pk for pk in set(counters) | set(expecteds)
+                if counters.get(pk) != expecteds.get(pk))
+            raise CommandError(
+                f'{model._meta.verbose_name_plural} mismatch for pk: {mismatches}')
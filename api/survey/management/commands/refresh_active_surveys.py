@@ -0,0 +1,20 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from ...models import ActiveSurveyModel
+
+
+class Command(BaseCommand):
+    help = ('Flips the set of active surveys to the ones published today. '
+            'Schedule it right after midnight, e.g. "5 0 * * *" in cron.')
+
+    def add_arguments(self, parser) -> None:
+        parser.add_argument(
+            '--date', type=date.fromisoformat, default=None,
+            help='Day in YYYY-MM-DD format to refresh the set for, today by default.')
+
+    def handle(self, *args, **options) -> None:
+        activated, deactivated = ActiveSurveyModel.refresh(options['date'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Activated {activated} and deactivated {deactivated} surveys.'))
@@ -1,13 +1,50 @@
-from datetime import date
-import uuid
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+import time
 
 from django.conf import settings
 from django.contrib.auth import models as auth_models
+from django.core.cache import cache
 from django.db import models as db_models
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, F, OuterRef, Q
 from django.db.models.query import QuerySet
+from django.utils import timezone
 
 from .utils.exceptions import (
     BeginDateEditTryException, NumberExcess, WrongChoiseException, WrongDateOrderException,)
+from .utils.keys import generate_unique_key
+
+
+class PublicationQuerySet(QuerySet):
+    """QuerySet which can filter out rows of unpublished surveys in SQL.
+
+    ``survey_lookup`` is the lookup path from the model to ``SurveyModel``."""
+    survey_lookup: str = ''
+
+    def published(self) -> QuerySet:
+        """Rows of surveys in the set of active ones."""
+        return self.filter(**{
+            f'{self.survey_lookup or "pk"}__in':
+                ActiveSurveyModel.objects.values('survey')})
+
+    def published_on(self, day: date) -> QuerySet:
+        """Rows of surveys which publication window includes ``day``."""
+        prefix = f'{self.survey_lookup}__' if self.survey_lookup else ''
+        return self.filter(
+            Q(**{f'{prefix}begin_date__isnull': True}) |
+            Q(**{f'{prefix}begin_date__lte': day}),
+            Q(**{f'{prefix}end_date__isnull': True}) |
+            Q(**{f'{prefix}end_date__gte': day}))
+
+
+class QuestionQuerySet(PublicationQuerySet):
+    survey_lookup = 'survey'
+
+
+class ResponseOptionQuerySet(PublicationQuerySet):
+    survey_lookup = 'question__survey'
 
 
 class SurveyModel(db_models.Model):
@@ -15,6 +52,11 @@ class SurveyModel(db_models.Model):
     description = db_models.TextField(null=False, blank=True)
     begin_date = db_models.DateField(null=True, blank=True)
     end_date = db_models.DateField(null=True, blank=True)
+    # Bumped on every change of the survey, its questions or response options.
+    version = db_models.PositiveIntegerField(default=1, editable=False)
+    updated_at = db_models.DateTimeField(auto_now=True)
+
+    objects = PublicationQuerySet.as_manager()
 
     __first_begin_date = None
 
@@ -28,7 +70,22 @@ class SurveyModel(db_models.Model):
     def save(self, *args, **kwargs) -> None:
         self.__block_begin_date()
         self.__check_order_of_begin_end_dates()
+        adding = self._state.adding
+        if not adding:
+            self.version = F('version') + 1
         super().save(*args, **kwargs)
+        if adding:
+            SurveyCounterModel.objects.create(survey=self)
+        else:
+            self.refresh_from_db(fields=['version'])
+        ActiveSurveyModel.sync(self, adding)
+
+    @classmethod
+    def touch(cls, pks: Iterable[int]) -> None:
+        """Bumps versions of the surveys when their questions or response
+        options change."""
+        cls.objects.filter(pk__in=pks).update(
+            version=F('version') + 1, updated_at=timezone.now())
 
     def __block_begin_date(self) -> None:
         if not self.__first_begin_date in ['', None]:
@@ -45,14 +102,89 @@ class SurveyModel(db_models.Model):
                         'Wrong order of begin end dates.')
 
     @property
-    def is_published(self) -> None:
+    def is_published(self) -> bool:
+        return self.pk in ActiveSurveyModel.get_ids()
+
+    @staticmethod
+    def is_published_between(begin_date: Optional[date], end_date: Optional[date]) -> bool:
         is_published: bool = True
-        if self.begin_date != None:
-            is_published &= self.begin_date <= date.today()
-        if self.end_date != None:
-            is_published &= date.today() <= self.end_date
+        if begin_date != None:
+            is_published &= begin_date <= date.today()
+        if end_date != None:
+            is_published &= date.today() <= end_date
         return is_published
 
+    @staticmethod
+    def last_modified_between(
+            updated_at: datetime, begin_date: Optional[date], end_date: Optional[date]) -> datetime:
+        """Returns the last moment representation of the survey changed: its
+        update or the begin or the end of its publication, whichever is later."""
+        last_modified = updated_at
+        now = timezone.now()
+        for day in (begin_date, end_date and end_date + timedelta(days=1)):
+            if day is None:
+                continue
+            moment = datetime.combine(day, datetime.min.time())
+            if settings.USE_TZ:
+                moment = timezone.make_aware(moment)
+            if last_modified < moment <= now:
+                last_modified = moment
+        return last_modified
+
+    def get_results(self) -> dict:
+        """Reads answer counters of every response option of the survey.
+        Percentages are relative to the number of answers on the question."""
+        rows = QuestionModel.objects.filter(survey=self).values(
+            'pk', 'type', 'content',
+            'response_options', 'response_options__content',
+            'response_options__counter__answers',
+        ).order_by('pk', 'response_options')
+
+        questions = {}
+        for row in rows:
+            question = questions.setdefault(row['pk'], {
+                'pk': row['pk'],
+                'type': row['type'],
+                'content': row['content'],
+                'answers': 0,
+                'response_options': [], })
+            answers = row['response_options__counter__answers'] or 0
+            question['answers'] += answers
+            if row['response_options'] is not None and row['type'] != 'text':
+                question['response_options'].append({
+                    'pk': row['response_options'],
+                    'content': row['response_options__content'],
+                    'answers': answers, })
+
+        for question in questions.values():
+            for response_option in question['response_options']:
+                response_option['percentage'] = round(
+                    100 * response_option['answers'] / question['answers'], 2) \
+                    if question['answers'] else 0.0
+
+        sessions = SurveyCounterModel.objects.filter(
+            survey=self).values_list('sessions', flat=True).first()
+        return {
+            'pk': self.pk,
+            'header': self.header,
+            'sessions': sessions or 0,
+            'questions': list(questions.values()), }
+
+    def get_answer_rows(self, chunk_size: int = 2000) -> Iterable[tuple]:
+        """Iterates over (session, actor, question, response option, content,
+        create time) of every answer of the survey, fetching them by chunks.
+        Response option is empty for text questions."""
+        rows = AnswerActModel.objects.filter(question__survey=self).order_by(
+            'create_time', 'pk',
+        ).values_list(
+            'session', 'session__actor', 'question', 'response', 'content',
+            'create_time', 'question_type',
+        ).iterator(chunk_size=chunk_size)
+        for session, actor, question, response, content, create_time, question_type in rows:
+            if question_type == 'text':
+                response = None
+            yield session, actor, question, response, content, create_time.isoformat()
+
     class Meta:
         db_table = 'api_surveys'
         verbose_name = 'survey'
@@ -68,14 +200,52 @@ class QuestionModel(db_models.Model):
 
     survey = db_models.ForeignKey(
         SurveyModel, on_delete=db_models.CASCADE,
-        related_name='questions', null=False)
+        related_name='questions', null=False, db_index=False)
     type = db_models.TextField(choices=TYPES.choices, blank=False, null=False)
     content = db_models.TextField(blank=True, null=False)
 
+    objects = QuestionQuerySet.as_manager()
+
+    __first_type = None
+    __first_survey_id = None
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.__first_type = self.type
+        self.__first_survey_id = self.survey_id
+
     def save(self, *args, **kwargs) -> None:
-        super().save(*args, **kwargs)
-        self.__check_type_is_correct()
-        self.__create_fake_response_option_for_text_type()
+        adding = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self.__check_type_is_correct()
+            if adding:
+                self.__create_fake_response_option_for_text_type()
+            elif self.__first_type != self.type:
+                self.__update_denormalized_type()
+            if not adding and self.__first_survey_id != self.survey_id:
+                # Answering sessions are counted by the survey of the question.
+                AnswerActModel.remark_sessions(
+                    AnswerActModel.objects.filter(question=self))
+        self.__first_type = self.type
+        self.__first_survey_id = self.survey_id
+
+    @property
+    def survey_pks(self) -> Set[int]:
+        """Pks of the survey of the question and, until the question is
+        saved, of the survey it was moved from."""
+        return {self.__first_survey_id, self.survey_id} - {None}
+
+    def __update_denormalized_type(self) -> None:
+        try:
+            with transaction.atomic():
+                ResponseOptionModel.objects.filter(
+                    question=self).update(question_type=self.type)
+                AnswerActModel.objects.filter(
+                    question=self).update(question_type=self.type)
+        except IntegrityError:
+            raise NumberExcess(
+                f'Existing answers don\'t fit this type of question ({self.type}).')
 
     def __check_type_is_correct(self) -> None:
         if self.type not in [type_short for type_short, type_long in QuestionModel.TYPES.choices]:
@@ -89,8 +259,8 @@ class QuestionModel(db_models.Model):
         return bool(ResponseOptionModel.objects.filter(question=self, content='fake_answer').count())
 
     @property
-    def is_published(self) -> None:
-        return self.survey.is_published
+    def is_published(self) -> bool:
+        return self.survey_id in ActiveSurveyModel.get_ids()
 
     def __create_fake_response_option_for_text_type(self) -> None:
         if self.type == 'text':
@@ -105,6 +275,13 @@ class QuestionModel(db_models.Model):
         verbose_name = 'question'
         verbose_name_plural = 'questions'
         ordering = ('pk',)
+        # Leading column of the index replaces the FK index of survey, the
+        # whole index serves capped questions of surveys (see limit_per_parent).
+        indexes = [
+            db_models.Index(
+                fields=['survey', 'id'],
+                name='api_question_survey_id_idx'),
+        ]
 
 
 class ResponseOptionModel(db_models.Model):
@@ -112,24 +289,64 @@ class ResponseOptionModel(db_models.Model):
         QuestionModel, on_delete=db_models.CASCADE,
         related_name='response_options', null=False)
     content = db_models.TextField(blank=False, null=False)
+    # Denormalized QuestionModel.type, it's used by unique constraints.
+    question_type = db_models.TextField(
+        choices=QuestionModel.TYPES.choices, null=False, editable=False)
+
+    objects = ResponseOptionQuerySet.as_manager()
+
+    __first_question_id = None
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.__first_question_id = self.question_id
 
     def save(self, *args, **kwargs) -> None:
-        if self.question.type == 'text':
-            self.__check_number_of_response_options()
-        super().save(*args, **kwargs)
+        self.question_type = self.question.type
+        adding = self._state.adding
+        try:
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+                if adding:
+                    ResponseOptionCounterModel.objects.create(response_option=self)
+                elif self.__first_question_id != self.question_id:
+                    self.__update_denormalized_question()
+        except IntegrityError:
+            if self.__is_number_of_response_options_exceeded():
+                raise NumberExcess(
+                    f'This type of question ({self.question_type}) can\'t have extra response options.')
+            raise
+        self.__first_question_id = self.question_id
+
+    @property
+    def question_pks(self) -> Set[int]:
+        """Pks of the question of the response option and, until the
+        response option is saved, of the question it was moved from."""
+        return {self.__first_question_id, self.question_id} - {None}
+
+    def __update_denormalized_question(self) -> None:
+        answer_acts = AnswerActModel.objects.filter(response=self)
+        try:
+            with transaction.atomic():
+                answer_acts.update(
+                    question=self.question_id, question_type=self.question_type)
+        except IntegrityError:
+            raise NumberExcess(
+                'Existing answers don\'t fit the question of this response option.')
+        # The question may belong to another survey.
+        AnswerActModel.remark_sessions(answer_acts)
 
     @property
     def is_published(self) -> bool:
-        return self.question.survey.is_published
+        return self.question.survey_id in ActiveSurveyModel.get_ids()
 
     @property
     def type(self) -> str:
-        return self.question.type
+        return self.question_type
 
-    def __check_number_of_response_options(self) -> None:
-        if ResponseOptionModel.objects.filter(question=self.question).count() > 0:
-            raise NumberExcess(
-                f'This type of question ({self.question.type}) can\'t have extra response options.')
+    def __is_number_of_response_options_exceeded(self) -> bool:
+        return self.question_type == 'text' and ResponseOptionModel.objects.filter(
+            question=self.question_id).exclude(pk=self.pk).exists()
 
     def __str__(self) -> str:
         return f'{self.question}: \'{self.content[:50]}\''
@@ -139,12 +356,18 @@ class ResponseOptionModel(db_models.Model):
         verbose_name = 'response option'
         verbose_name_plural = 'response options'
         ordering = ('pk',)
+        constraints = [
+            db_models.UniqueConstraint(
+                fields=['question'],
+                condition=Q(question_type='text'),
+                name='api_response_options_single_for_text'),
+        ]
 
 
 class ActorModel(db_models.Model):
     unique_key = db_models.UUIDField(
         primary_key=True,
-        default=uuid.uuid4,
+        default=generate_unique_key,
         editable=False)
     user = db_models.OneToOneField(
         settings.AUTH_USER_MODEL,
@@ -177,12 +400,12 @@ class ActorModel(db_models.Model):
 class SessionModel(db_models.Model):
     unique_key = db_models.UUIDField(
         primary_key=True,
-        default=uuid.uuid4,
+        default=generate_unique_key,
         editable=False)
     __first_unique_key = None
     actor = db_models.ForeignKey(
         ActorModel, on_delete=db_models.CASCADE,
-        null=False, related_name='sessions')
+        null=False, related_name='sessions', db_index=False)
 
     def __init__(self, *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
@@ -204,18 +427,39 @@ class SessionModel(db_models.Model):
         verbose_name = 'survey session'
         verbose_name_plural = 'survey sessions'
         ordering = ('pk',)
+        # Leading column of the index replaces the FK index of actor, the
+        # whole index serves capped sessions of actors (see limit_per_parent).
+        indexes = [
+            db_models.Index(
+                fields=['actor', 'unique_key'],
+                name='api_session_actor_key_idx'),
+        ]
 
 
 class AnswerActModel(db_models.Model):
     session = db_models.ForeignKey(
         SessionModel, on_delete=db_models.CASCADE,
-        related_name='answer_acts', null=False)
+        related_name='answer_acts', null=False, db_index=False)
     response = db_models.ForeignKey(
         ResponseOptionModel, null=False, on_delete=db_models.CASCADE,
         related_name='answer_acts')
+    # Denormalized response.question and its type, they're used by unique constraints.
+    question = db_models.ForeignKey(
+        QuestionModel, null=False, on_delete=db_models.CASCADE,
+        related_name='answer_acts', editable=False, db_index=False)
+    question_type = db_models.TextField(
+        choices=QuestionModel.TYPES.choices, null=False, editable=False)
     content = db_models.TextField(null=True)
     create_time = db_models.DateTimeField(auto_now_add=True, null=False)
 
+    __first_response_id = None
+    __first_session_id = None
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.__first_response_id = self.response_id
+        self.__first_session_id = self.session_id
+
     def __str__(self):
         if self.response.question.type == 'text':
             return f'{self.actor}-> {self.response.question}: {self.content[:50]}'
@@ -223,27 +467,328 @@ class AnswerActModel(db_models.Model):
             return f'{self.actor}-> {self.response}'
 
     def save(self, *args, **kwargs) -> None:
-        self.__check_number_of_answers()
-        super().save(*args, **kwargs)
-
-    def __check_number_of_answers(self) -> None:
-        if self.response.question.type in ['one', 'text']:
-            if AnswerActModel.objects.filter(
-                session=self.session,
-                response__question=self.response.question,
-            ).count() > 0:
-                raise NumberExcess(
-                    'Number of answers on this question in this session is exceeded')
-        elif self.response.question.type in ['many']:
-            if AnswerActModel.objects.filter(
-                session=self.session,
-                response=self.response,
-            ).count() > 0:
+        self.question_id = self.response.question_id
+        self.question_type = self.response.question_type
+        adding = self._state.adding
+        try:
+            with transaction.atomic():
+                super().save(*args, **kwargs)
+                if adding:
+                    AnswerActModel.update_counters([self])
+                elif (self.__first_response_id, self.__first_session_id) \
+                        != (self.response_id, self.session_id):
+                    # The answer is uncounted as the one it was and counted
+                    # as a new one.
+                    AnswerActModel.uncount(
+                        {self.__first_response_id: 1}, {self.__first_session_id})
+                    AnswerActModel.update_counters([self])
+        except IntegrityError:
+            if self.__is_number_of_answers_exceeded():
                 raise NumberExcess(
                     'Number of answers on this question in this session is exceeded')
+            raise
+        self.__first_response_id = self.response_id
+        self.__first_session_id = self.session_id
+
+    def __is_number_of_answers_exceeded(self) -> bool:
+        answer_acts = AnswerActModel.objects.filter(
+            session=self.session_id).exclude(pk=self.pk)
+        if self.question_type in ['one', 'text']:
+            return answer_acts.filter(question=self.question_id).exists()
+        else:
+            return answer_acts.filter(response=self.response_id).exists()
+
+    @classmethod
+    def bulk_create_for_session(
+            cls, session: SessionModel, answer_acts: List['AnswerActModel']) \
+            -> List['AnswerActModel']:
+        """Checks number of answers in memory against answers already given
+        in ``session`` (fetched with a single query) and inserts
+        ``answer_acts`` with one ``bulk_create`` in a transaction."""
+        try:
+            with transaction.atomic():
+                existings = cls.objects.filter(session=session).values_list(
+                    'response', 'question')
+                answered_responses = {response for response, _ in existings}
+                answered_questions = {question for _, question in existings}
+
+                for answer_act in answer_acts:
+                    answer_act.session = session
+                    answer_act.question_id = answer_act.response.question_id
+                    answer_act.question_type = answer_act.response.question_type
+                    if answer_act.question_type in ['one', 'text']:
+                        if answer_act.question_id in answered_questions:
+                            raise NumberExcess(
+                                'Number of answers on this question in this session is exceeded')
+                    elif answer_act.question_type in ['many']:
+                        if answer_act.response_id in answered_responses:
+                            raise NumberExcess(
+                                'Number of answers on this question in this session is exceeded')
+                    answered_questions.add(answer_act.question_id)
+                    answered_responses.add(answer_act.response_id)
+
+                answer_acts = cls.objects.bulk_create(answer_acts)
+                cls.update_counters(answer_acts)
+                return answer_acts
+        except IntegrityError:
+            # Answers of the session were added concurrently.
+            raise NumberExcess(
+                'Number of answers on this question in this session is exceeded')
+
+    @classmethod
+    def update_counters(cls, answer_acts: Iterable['AnswerActModel']) -> None:
+        """Updates answer counters of response options and session counters
+        of surveys after ``answer_acts`` were created. It should run in the
+        transaction which created ``answer_acts``."""
+        answer_acts = list(answer_acts)
+        ResponseOptionCounterModel.add(Counter(
+            answer_act.response_id for answer_act in answer_acts), 1)
+
+        surveys = dict(QuestionModel.objects.filter(
+            pk__in={answer_act.question_id for answer_act in answer_acts},
+        ).values_list('pk', 'survey'))
+        pairs = {
+            (answer_act.session_id, surveys[answer_act.question_id])
+            for answer_act in answer_acts if answer_act.question_id in surveys}
+        if pairs:
+            # Session is counted by the survey once it's marked as its answerer.
+            SurveyCounterModel.add(Counter(SurveySessionModel.add(pairs)), 1)
+
+    @classmethod
+    def uncount(cls, responses: Dict[int, int], sessions: Iterable[Any]) -> None:
+        """Updates counters after answers were deleted. ``responses`` are
+        numbers of deleted answers per response option and ``sessions`` are
+        sessions of deleted answers, they're uncounted by surveys they have
+        no answers in anymore."""
+        ResponseOptionCounterModel.add(responses, -1)
+        SurveyCounterModel.add(SurveySessionModel.remove_unanswered(sessions), -1)
+
+    @classmethod
+    def remark_sessions(cls, answer_acts: QuerySet) -> None:
+        """Marks sessions of ``answer_acts`` as answerers of surveys their
+        questions belong to and unmarks them in surveys they have no answers
+        in anymore, after the answers or their questions moved."""
+        pairs = set(answer_acts.order_by().values_list('session', 'question__survey'))
+        if pairs:
+            SurveyCounterModel.add(Counter(SurveySessionModel.add(pairs)), 1)
+            SurveyCounterModel.add(SurveySessionModel.remove_unanswered(
+                {session for session, _ in pairs}), -1)
 
     class Meta:
         db_table = 'api_answer_acts'
         verbose_name = 'answer act'
         verbose_name_plural = 'answer acts'
         ordering = ('create_time', 'pk',)
+        # Leading columns of these indexes replace the FK indexes of session and question.
+        indexes = [
+            db_models.Index(
+                fields=['session', 'create_time', 'id'],
+                name='api_answer_session_time_idx'),
+            db_models.Index(
+                fields=['question', 'create_time', 'id'],
+                name='api_answer_question_time_idx'),
+        ]
+        constraints = [
+            db_models.UniqueConstraint(
+                fields=['session', 'question'],
+                condition=Q(question_type__in=['one', 'text']),
+                name='api_answer_acts_single_per_question'),
+            db_models.UniqueConstraint(
+                fields=['session', 'response'],
+                name='api_answer_acts_single_per_response'),
+        ]
+
+
+class ActiveSurveyModel(db_models.Model):
+    """Set of surveys published today.
+
+    Rows are kept in sync by ``SurveyModel.save`` and flipped at publication
+    boundaries by the ``refresh_active_surveys`` command, which is meant to be
+    scheduled right after midnight. Ids of the set are memoized in the process
+    until the version of the set changes. The version is kept in the cache,
+    which must be shared by all processes (see ``CACHES``), so changes made
+    by any of them are seen by the others. It's checked once per
+    ``SURVEY_ACTIVE_IDS_VERSION_CHECK_INTERVAL`` seconds, so reads of the ids
+    don't hit the cache, and changes made by the process itself reset the
+    memo at once. The memo expires after ``SURVEY_ACTIVE_IDS_MEMO_TIMEOUT``
+    seconds anyway, in case the version is evicted or a change doesn't reach
+    the cache."""
+    survey = db_models.OneToOneField(
+        SurveyModel, on_delete=db_models.CASCADE,
+        primary_key=True, related_name='active')
+
+    version_key = 'surveys:active:version'
+    # Version, time of its next check, expiration time and ids of the set.
+    ids_memo: Tuple[Any, float, float, FrozenSet[int]] = (None, 0.0, 0.0, frozenset())
+
+    @classmethod
+    def get_ids(cls) -> FrozenSet[int]:
+        memo_version, check_at, expires_at, ids = cls.ids_memo
+        now = time.monotonic()
+        if now < check_at:
+            return ids
+        version = cache.get(cls.version_key)
+        if version is None:
+            cache.add(cls.version_key, time.time_ns(), None)
+            version = cache.get(cls.version_key)
+        if memo_version != version or expires_at <= now:
+            ids = frozenset(cls.objects.values_list('survey', flat=True))
+            expires_at = now + settings.SURVEY_ACTIVE_IDS_MEMO_TIMEOUT
+        check_at = min(now + settings.SURVEY_ACTIVE_IDS_VERSION_CHECK_INTERVAL, expires_at)
+        cls.ids_memo = (version, check_at, expires_at, ids)
+        return ids
+
+    @classmethod
+    def invalidate(cls) -> None:
+        cls.ids_memo = (None, 0.0, 0.0, frozenset())
+        # A new version is set rather than incremented, increments of some
+        # shared backends (e.g. the file based one) aren't atomic.
+        cache.set(cls.version_key, time.time_ns(), None)
+
+    @classmethod
+    def invalidate_on_commit(cls) -> None:
+        # Invalidated twice, so ids read before the commit are not memoized
+        # under the final version.
+        cls.invalidate()
+        transaction.on_commit(cls.invalidate)
+
+    @classmethod
+    def sync(cls, survey: SurveyModel, adding: bool = False) -> None:
+        if SurveyModel.is_published_between(survey.begin_date, survey.end_date):
+            cls.objects.bulk_create([cls(survey=survey)], ignore_conflicts=True)
+        elif not adding:
+            cls.objects.filter(survey=survey).delete()
+        cls.invalidate_on_commit()
+
+    @classmethod
+    def refresh(cls, day: Optional[date] = None) -> Tuple[int, int]:
+        """Flips the set to surveys published on ``day``. Returns numbers of
+        activated and deactivated surveys."""
+        with transaction.atomic():
+            published = set(SurveyModel.objects.published_on(
+                day or date.today()).values_list('pk', flat=True))
+            active = set(cls.objects.values_list('survey', flat=True))
+            cls.objects.filter(survey__in=active - published).delete()
+            cls.objects.bulk_create([
+                cls(survey_id=pk) for pk in published - active])
+            cls.invalidate_on_commit()
+        return len(published - active), len(active - published)
+
+    class Meta:
+        db_table = 'api_active_surveys'
+        verbose_name = 'active survey'
+        verbose_name_plural = 'active surveys'
+        ordering = ('pk',)
+
+
+def add_to_counters(model: db_models.Model, field: str, numbers: Dict[Any, int], delta: int) -> None:
+    """Atomically adds ``numbers[pk] * delta`` to ``field`` of counter rows,
+    with one UPDATE per distinct number."""
+    pks_by_number: Dict[int, List[Any]] = defaultdict(list)
+    for pk, number in numbers.items():
+        pks_by_number[number * delta].append(pk)
+    for number, pks in pks_by_number.items():
+        model.objects.filter(pk__in=pks).update(**{field: F(field) + number})
+
+
+class ResponseOptionCounterModel(db_models.Model):
+    response_option = db_models.OneToOneField(
+        ResponseOptionModel, on_delete=db_models.CASCADE,
+        primary_key=True, related_name='counter')
+    answers = db_models.PositiveIntegerField(default=0, null=False)
+
+    @classmethod
+    def add(cls, numbers: Dict[int, int], delta: int) -> None:
+        add_to_counters(cls, 'answers', numbers, delta)
+
+    class Meta:
+        db_table = 'api_response_option_counters'
+        verbose_name = 'response option counter'
+        verbose_name_plural = 'response option counters'
+        ordering = ('pk',)
+
+
+class SurveyCounterModel(db_models.Model):
+    survey = db_models.OneToOneField(
+        SurveyModel, on_delete=db_models.CASCADE,
+        primary_key=True, related_name='counter')
+    sessions = db_models.PositiveIntegerField(default=0, null=False)
+
+    @classmethod
+    def add(cls, numbers: Dict[int, int], delta: int) -> None:
+        add_to_counters(cls, 'sessions', numbers, delta)
+
+    class Meta:
+        db_table = 'api_survey_counters'
+        verbose_name = 'survey counter'
+        verbose_name_plural = 'survey counters'
+        ordering = ('pk',)
+
+
+class SurveySessionModel(db_models.Model):
+    """Session which has answers in the survey, i.e. is counted by its
+    ``SurveyCounterModel``. Rows are unique, so of concurrent first answers
+    of the session only one counts it."""
+    survey = db_models.ForeignKey(
+        SurveyModel, on_delete=db_models.CASCADE, related_name='+')
+    # Not constrained: rows of deleted sessions are removed when their
+    # deleted answers are uncounted.
+    session = db_models.ForeignKey(
+        SessionModel, on_delete=db_models.DO_NOTHING, db_constraint=False,
+        related_name='+')
+
+    @classmethod
+    def add(cls, pairs: Set[Tuple[Any, int]]) -> List[int]:
+        """Marks sessions as answerers of surveys by (session, survey)
+        ``pairs``. Returns surveys of the pairs which weren't marked yet."""
+        marked = set(cls.objects.filter(
+            session__in={session for session, _ in pairs},
+            survey__in={survey for _, survey in pairs},
+        ).values_list('session', 'survey'))
+        news = [pair for pair in pairs if pair not in marked]
+        if not news:
+            return []
+        try:
+            with transaction.atomic():
+                cls.objects.bulk_create([
+                    cls(session_id=session, survey_id=survey) for session, survey in news])
+            return [survey for _, survey in news]
+        except IntegrityError:
+            pass
+        # Some pairs were marked concurrently, they're sorted out one by one.
+        surveys = []
+        for session, survey in news:
+            try:
+                with transaction.atomic():
+                    cls.objects.create(session_id=session, survey_id=survey)
+                surveys.append(survey)
+            except IntegrityError:
+                pass
+        return surveys
+
+    @classmethod
+    def remove_unanswered(cls, sessions: Iterable[Any]) -> Dict[int, int]:
+        """Unmarks ``sessions`` in surveys they have no answers in anymore.
+        Returns numbers of unmarked sessions per survey."""
+        pks_by_survey: Dict[int, List[int]] = defaultdict(list)
+        for pk, survey in cls.objects.filter(session__in=sessions).filter(~Exists(
+                AnswerActModel.objects.filter(
+                    session=OuterRef('session'), question__survey=OuterRef('survey'))),
+        ).values_list('pk', 'survey'):
+            pks_by_survey[survey].append(pk)
+        # Numbers of deleted rows, so rows removed concurrently aren't
+        # uncounted twice.
+        return {
+            survey: cls.objects.filter(pk__in=pks).delete()[0]
+            for survey, pks in pks_by_survey.items()}
+
+    class Meta:
+        db_table = 'api_survey_sessions'
+        verbose_name = 'answering session'
+        verbose_name_plural = 'answering sessions'
+        ordering = ('pk',)
+        constraints = [
+            db_models.UniqueConstraint(
+                fields=['session', 'survey'],
+                name='api_survey_sessions_single_per_survey'),
+        ]
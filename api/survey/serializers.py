@@ -1,24 +1,33 @@
-from typing import List
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
 
 from rest_framework import serializers
+from rest_framework.reverse import reverse
 
 from .models import (
+    ActiveSurveyModel,
     ActorModel,
     AnswerActModel,
     QuestionModel,
     ResponseOptionModel,
     SessionModel,
     SurveyModel, )
+from .utils.pagination import KeysetPagination, limit_per_parent
 from .utils.relations import ModelRelaitedField
+from .utils.serializers import (
+    CappedListSerializer, ExpandableFieldsMixin, NestedNextLinkField,)
 
+# Nested collections of detail representations show their first page only.
+NESTED_COLLECTION_LIMIT = KeysetPagination.page_size
 
-class QuestionShortSerializer(serializers.HyperlinkedModelSerializer):
+
+class QuestionShortSerializer(ExpandableFieldsMixin, serializers.HyperlinkedModelSerializer):
     class Meta:
         model = QuestionModel
         fields = ["pk", "url", "type", "content", ]
 
 
-class ResponseOptionShortSerializer(serializers.HyperlinkedModelSerializer):
+class ResponseOptionShortSerializer(ExpandableFieldsMixin, serializers.HyperlinkedModelSerializer):
     question = ModelRelaitedField(
         serializer_class=QuestionShortSerializer, queryset=QuestionModel.objects.all())
 
@@ -27,7 +36,7 @@ class ResponseOptionShortSerializer(serializers.HyperlinkedModelSerializer):
         fields = ["pk", "url", "question", "content", ]
 
 
-class ResponseOptionDetailSerializer(serializers.HyperlinkedModelSerializer):
+class ResponseOptionDetailSerializer(ExpandableFieldsMixin, serializers.HyperlinkedModelSerializer):
     question = ModelRelaitedField(
         serializer_class=QuestionShortSerializer, queryset=QuestionModel.objects.all())
 
@@ -36,7 +45,7 @@ class ResponseOptionDetailSerializer(serializers.HyperlinkedModelSerializer):
         fields = ["pk", "url", "question", "content", "is_published", ]
 
 
-class QuestionDetailSerializer(serializers.HyperlinkedModelSerializer):
+class QuestionDetailSerializer(ExpandableFieldsMixin, serializers.HyperlinkedModelSerializer):
     response_options = ResponseOptionShortSerializer(many=True, required=False)
 
     class Meta:
@@ -45,7 +54,7 @@ class QuestionDetailSerializer(serializers.HyperlinkedModelSerializer):
                   "response_options", "is_published", ]
 
 
-class SurveyShortSerializer(serializers.HyperlinkedModelSerializer):
+class SurveyShortSerializer(ExpandableFieldsMixin, serializers.HyperlinkedModelSerializer):
     questions = QuestionShortSerializer(many=True, required=False)
 
     class Meta:
@@ -53,23 +62,50 @@ class SurveyShortSerializer(serializers.HyperlinkedModelSerializer):
         fields = ["pk", "header", "description", "questions", ]
 
 
-class SurveyDetailSerializer(serializers.HyperlinkedModelSerializer):
-    questions = QuestionShortSerializer(many=True, required=False)
+class SurveyDetailSerializer(ExpandableFieldsMixin, serializers.HyperlinkedModelSerializer):
+    questions = CappedListSerializer(
+        child=QuestionShortSerializer(), limit=NESTED_COLLECTION_LIMIT, read_only=True)
+    questions_next = NestedNextLinkField(
+        "questions", "surveymodel-questions", NESTED_COLLECTION_LIMIT)
     is_published = serializers.ReadOnlyField(read_only=True)
 
     class Meta:
         model = SurveyModel
-        fields = ["pk", "url", "header", "description", "questions",
+        fields = ["pk", "url", "header", "description", "questions", "questions_next",
                   "begin_date", "end_date", "is_published", ]
 
 
-class ActorShortSerializer(serializers.HyperlinkedModelSerializer):
+class ResponseOptionDocumentSerializer(serializers.HyperlinkedModelSerializer):
+    class Meta:
+        model = ResponseOptionModel
+        fields = ["pk", "url", "content", ]
+
+
+class QuestionDocumentSerializer(serializers.HyperlinkedModelSerializer):
+    response_options = ResponseOptionDocumentSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = QuestionModel
+        fields = ["pk", "url", "type", "content", "response_options", ]
+
+
+class SurveyDocumentSerializer(serializers.HyperlinkedModelSerializer):
+    """Whole survey a respondent needs to answer it."""
+    questions = QuestionDocumentSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = SurveyModel
+        fields = ["pk", "url", "header", "description", "questions",
+                  "begin_date", "end_date", ]
+
+
+class ActorShortSerializer(ExpandableFieldsMixin, serializers.HyperlinkedModelSerializer):
     class Meta:
         model = ActorModel
         fields = ["pk", "url", ]
 
 
-class SessionShortSerializer(serializers.HyperlinkedModelSerializer):
+class SessionShortSerializer(ExpandableFieldsMixin, serializers.HyperlinkedModelSerializer):
     actor = ModelRelaitedField(
         serializer_class=ActorShortSerializer,
         queryset=ActorModel.objects.all())
@@ -79,27 +115,41 @@ class SessionShortSerializer(serializers.HyperlinkedModelSerializer):
         fields = ["pk", "url", "actor"]
 
 
-class SessionDetailSerializer(serializers.HyperlinkedModelSerializer):
+class SessionAnswerActSerializer(serializers.ModelSerializer):
+    """Answer of the session as plain ids, which are read from the answer row
+    itself (question is denormalized), so prefetched answers need no queries."""
+    question = serializers.PrimaryKeyRelatedField(read_only=True)
+    response = serializers.PrimaryKeyRelatedField(read_only=True)
+
+    class Meta:
+        model = AnswerActModel
+        fields = ["pk", "question", "response", "content", ]
+
+
+class SessionDetailSerializer(ExpandableFieldsMixin, serializers.HyperlinkedModelSerializer):
     actor = ModelRelaitedField(
         queryset=ActorModel.objects.all(),
         serializer_class=ActorShortSerializer)
 
-    answer_acts = ActorShortSerializer(many=True, required=False)
+    answer_acts = SessionAnswerActSerializer(many=True, read_only=True)
 
     class Meta:
         model = SessionModel
         fields = ["pk", "url", "actor", "answer_acts"]
 
 
-class ActorDetailSerializer(serializers.HyperlinkedModelSerializer):
-    sessions = SessionShortSerializer(many=True, required=False)
+class ActorDetailSerializer(ExpandableFieldsMixin, serializers.HyperlinkedModelSerializer):
+    sessions = CappedListSerializer(
+        child=SessionShortSerializer(), limit=NESTED_COLLECTION_LIMIT, read_only=True)
+    sessions_next = NestedNextLinkField(
+        "sessions", "actormodel-sessions", NESTED_COLLECTION_LIMIT)
 
     class Meta:
         model = ActorModel
-        fields = ["pk", "url", "sessions", ]
+        fields = ["pk", "url", "sessions", "sessions_next", ]
 
 
-class AnswerActDetailSerializer(serializers.HyperlinkedModelSerializer):
+class AnswerActDetailSerializer(ExpandableFieldsMixin, serializers.HyperlinkedModelSerializer):
     session = ModelRelaitedField(
         queryset=SessionModel.objects.all(),
         serializer_class=SessionShortSerializer)
@@ -111,3 +161,161 @@ class AnswerActDetailSerializer(serializers.HyperlinkedModelSerializer):
     class Meta:
         model = AnswerActModel
         fields = ["pk", "url", "session", "response", ]
+
+
+class AnswerActBulkItemSerializer(serializers.Serializer):
+    response = serializers.CharField()
+    content = serializers.CharField(
+        required=False, allow_null=True, allow_blank=True)
+
+
+class AnswerActBulkSerializer(serializers.Serializer):
+    session = ModelRelaitedField(
+        queryset=SessionModel.objects.all(),
+        serializer_class=SessionShortSerializer)
+
+    answers = AnswerActBulkItemSerializer(many=True, allow_empty=False)
+
+    def validate_answers(self, answers: List[dict]) -> List[AnswerActModel]:
+        responses = ModelRelaitedField(
+            serializer_class=ResponseOptionShortSerializer,
+            queryset=ResponseOptionModel.objects.all(), many=True)
+        response_options = responses.to_internal_value(
+            [answer["response"] for answer in answers])
+
+        return [
+            AnswerActModel(
+                response=response_option,
+                content=answer.get("content"))
+            for response_option, answer in zip(response_options, answers)]
+
+    def create(self, validated_data) -> List[AnswerActModel]:
+        return AnswerActModel.bulk_create_for_session(
+            validated_data["session"], validated_data["answers"])
+
+
+class RowSerializer:
+    """Read-only stand-in for ``serializer_class`` on hot read paths.
+
+    Represents rows of ``.values(*values)`` without serializer field machinery
+    and ``reverse()`` per object: hyperlinks are joined to list urls reversed
+    once per serializer. Output equals the one of ``serializer_class``."""
+    serializer_class = None
+    values: Tuple[str, ...] = ()
+
+    def __init__(self, instance, many: bool = False, context: dict = None) -> None:
+        self.instance = instance
+        self.many = many
+        self.request = context["request"]
+        self.list_urls: Dict[str, str] = {}
+
+    @property
+    def data(self):
+        rows = list(self.instance) if self.many else [self.instance]
+        representations = self.to_representations(rows)
+        return representations if self.many else representations[0]
+
+    def to_representations(self, rows: List[dict]) -> List[dict]:
+        raise NotImplementedError
+
+    def get_url(self, model, pk) -> str:
+        basename = model._meta.object_name.lower()
+        if basename not in self.list_urls:
+            self.list_urls[basename] = reverse(
+                f"{basename}-list", request=self.request)
+        return f"{self.list_urls[basename]}{pk}/"
+
+    def get_question_short(self, pk, type: str, content: str) -> dict:
+        return {
+            "pk": pk,
+            "url": self.get_url(QuestionModel, pk),
+            "type": type,
+            "content": content, }
+
+    @staticmethod
+    def get_next_link(url: str, items: List[dict]) -> Optional[str]:
+        """Mirrors ``NestedNextLinkField`` for ``items`` fetched up to
+        ``NESTED_COLLECTION_LIMIT + 1``."""
+        if len(items) <= NESTED_COLLECTION_LIMIT:
+            return None
+        return KeysetPagination().encode_cursor(
+            [items[NESTED_COLLECTION_LIMIT - 1]["pk"]], reverse=False, url=url)
+
+    @staticmethod
+    def get_date(value):
+        return None if value is None else value.isoformat()
+
+
+class SurveyDetailRowSerializer(RowSerializer):
+    serializer_class = SurveyDetailSerializer
+    values = ("pk", "header", "description", "begin_date", "end_date", )
+
+    def to_representations(self, rows: List[dict]) -> List[dict]:
+        questions: Dict[int, List[dict]] = defaultdict(list)
+        for question in limit_per_parent(
+                QuestionModel.objects.filter(survey__in=[row["pk"] for row in rows]),
+                "survey", NESTED_COLLECTION_LIMIT + 1,
+        ).values("pk", "survey", "type", "content"):
+            questions[question["survey"]].append(self.get_question_short(
+                question["pk"], question["type"], question["content"]))
+
+        active_survey_ids = ActiveSurveyModel.get_ids()
+        return [{
+            "pk": row["pk"],
+            "url": self.get_url(SurveyModel, row["pk"]),
+            "header": row["header"],
+            "description": row["description"],
+            "questions": questions[row["pk"]][:NESTED_COLLECTION_LIMIT],
+            "questions_next": self.get_next_link(
+                f"{self.get_url(SurveyModel, row['pk'])}questions/", questions[row["pk"]]),
+            "begin_date": self.get_date(row["begin_date"]),
+            "end_date": self.get_date(row["end_date"]),
+            "is_published": row["pk"] in active_survey_ids,
+        } for row in rows]
+
+
+class QuestionDetailRowSerializer(RowSerializer):
+    serializer_class = QuestionDetailSerializer
+    values = ("pk", "survey", "type", "content", )
+
+    def to_representations(self, rows: List[dict]) -> List[dict]:
+        questions = {
+            row["pk"]: self.get_question_short(row["pk"], row["type"], row["content"])
+            for row in rows}
+        response_options: Dict[int, List[dict]] = defaultdict(list)
+        for response_option in ResponseOptionModel.objects.filter(
+                question__in=list(questions),
+        ).values("pk", "question", "content"):
+            response_options[response_option["question"]].append({
+                "pk": response_option["pk"],
+                "url": self.get_url(ResponseOptionModel, response_option["pk"]),
+                "question": questions[response_option["question"]],
+                "content": response_option["content"], })
+
+        active_survey_ids = ActiveSurveyModel.get_ids()
+        return [{
+            "pk": row["pk"],
+            "url": questions[row["pk"]]["url"],
+            "survey": self.get_url(SurveyModel, row["survey"]),
+            "type": row["type"],
+            "content": row["content"],
+            "response_options": response_options[row["pk"]],
+            "is_published": row["survey"] in active_survey_ids,
+        } for row in rows]
+
+
+class ResponseOptionDetailRowSerializer(RowSerializer):
+    serializer_class = ResponseOptionDetailSerializer
+    values = ("pk", "question", "question__survey", "question__type",
+              "question__content", "content", )
+
+    def to_representations(self, rows: List[dict]) -> List[dict]:
+        active_survey_ids = ActiveSurveyModel.get_ids()
+        return [{
+            "pk": row["pk"],
+            "url": self.get_url(ResponseOptionModel, row["pk"]),
+            "question": self.get_question_short(
+                row["question"], row["question__type"], row["question__content"]),
+            "content": row["content"],
+            "is_published": row["question__survey"] in active_survey_ids,
+        } for row in rows]
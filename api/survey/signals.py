@@ -0,0 +1,80 @@
+from collections import Counter
+from typing import Any, Set
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import documents
+from .models import (
+    AnswerActModel, QuestionModel, ResponseOptionModel, SurveyModel,)
+
+
+class DeletedAnswerActs:
+    """Answers deleted in a transaction, they're uncounted at once after it's
+    committed rather than one by one."""
+
+    def __init__(self) -> None:
+        self.responses: Counter = Counter()
+        self.sessions: Set[Any] = set()
+        self.uncounted = False
+
+    def add(self, answer_act: AnswerActModel) -> None:
+        self.responses[answer_act.response_id] += 1
+        self.sessions.add(answer_act.session_id)
+
+    def __call__(self) -> None:
+        with transaction.atomic():
+            AnswerActModel.uncount(self.responses, self.sessions)
+        self.uncounted = True
+
+
+@receiver(post_delete, sender=AnswerActModel)
+def uncount_deleted_answer_act(
+        sender, instance: AnswerActModel, using: str, **kwargs) -> None:
+    # Callbacks of rolled back transactions are dropped along with the
+    # answers collected by them.
+    deleteds = next((
+        callback for _, callback in transaction.get_connection(using).run_on_commit
+        if isinstance(callback, DeletedAnswerActs) and not callback.uncounted), None)
+    if deleteds is None:
+        deleteds = DeletedAnswerActs()
+        deleteds.add(instance)
+        transaction.on_commit(deleteds, using)
+    else:
+        deleteds.add(instance)
+
+
+@receiver(post_save, sender=SurveyModel)
+@receiver(post_delete, sender=SurveyModel)
+def invalidate_survey_documents(sender, instance: SurveyModel, **kwargs) -> None:
+    documents.invalidate_on_commit(instance.pk)
+
+
+def touch_surveys(survey_pks: Set[int]) -> None:
+    SurveyModel.touch(survey_pks)
+    for survey_pk in survey_pks:
+        documents.invalidate_on_commit(survey_pk)
+
+
+# Parents are the ones before and after the save, so a moved child touches
+# the survey it left too.
+@receiver(post_save, sender=QuestionModel)
+@receiver(post_delete, sender=QuestionModel)
+def touch_question_survey(sender, instance: QuestionModel, **kwargs) -> None:
+    touch_surveys(instance.survey_pks)
+
+
+@receiver(post_save, sender=ResponseOptionModel)
+@receiver(post_delete, sender=ResponseOptionModel)
+def touch_response_option_survey(
+        sender, instance: ResponseOptionModel, **kwargs) -> None:
+    question_pks = instance.question_pks
+    if question_pks == {instance.question_id} \
+            and ResponseOptionModel.question.is_cached(instance):
+        survey_pks = {instance.question.survey_id}
+    else:
+        survey_pks = set(QuestionModel.objects.filter(
+            pk__in=question_pks).values_list('survey', flat=True))
+    if survey_pks:
+        touch_surveys(survey_pks)
@@ -1,10 +1,23 @@
 from datetime import timedelta
+from io import StringIO
 from datetime import date
 from random import randint
+from unittest import mock
 from uuid import uuid4
-
-from django.test import TestCase
-
+import shutil
+import tempfile
+import uuid
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, F
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from ..utils.keys import uuid7
 from .models import *
 from .utils import *
 
@@ -36,6 +49,54 @@ class SurveyModelTestCase(TestCase):
                     survey.is_published,
                     survey.begin_date <= date.today() and survey.end_date >= date.today())
 
+    def test_published_queryset(self):
+        surveys = create_test_surveys_via_model()
+        self.assertEqual(
+            set(SurveyModel.objects.published()),
+            {survey for survey in surveys if survey.is_published})
+
+    def test_refresh_active_surveys_command(self):
+        surveys = create_test_surveys_via_model()
+        tomorrow = date.today() + timedelta(days=1)
+        call_command(
+            'refresh_active_surveys', '--date', tomorrow.isoformat(), stdout=StringIO())
+        self.assertEqual(
+            {survey for survey in surveys if survey.is_published},
+            set(SurveyModel.objects.published_on(tomorrow)))
+        self.assertEqual(
+            set(SurveyModel.objects.published()),
+            set(SurveyModel.objects.published_on(tomorrow)))
+
+        call_command('refresh_active_surveys', stdout=StringIO())
+        self.assertEqual(
+            {survey for survey in surveys if survey.is_published},
+            set(SurveyModel.objects.published_on(date.today())))
+
+    def test_version_bumped_by_changes_of_survey_content(self):
+        survey = create_test_survey_via_model()
+        self.assertEqual(survey.version, 1)
+        survey.header = "Changed survey"
+        survey.save()
+        self.assertEqual(survey.version, 2)
+        question = create_test_questions_via_model(survey, ("one",), 1)[0]
+        create_test_response_options_via_model(question, 1)
+        question.delete()
+        # question save, response option save, question and option delete
+        self.assertEqual(
+            SurveyModel.objects.get(pk=survey.pk).version, 6)
+
+    def test_last_modified_by_publication_dates(self):
+        updated_at = timezone.now() - timedelta(days=3)
+        self.assertEqual(
+            SurveyModel.last_modified_between(updated_at, None, None), updated_at)
+        begin_date = date.today() - timedelta(days=1)
+        last_modified = SurveyModel.last_modified_between(updated_at, begin_date, None)
+        self.assertEqual(timezone.localtime(last_modified).date(), begin_date)
+        self.assertEqual(
+            SurveyModel.last_modified_between(
+                updated_at, None, date.today() + timedelta(days=1)),
+            updated_at)
+
     def test_block_begin_date(self):
         survey = create_test_survey_via_model(begin_date=date.today())
         survey.begin_date += timedelta(days=1)
@@ -45,6 +106,47 @@ class SurveyModelTestCase(TestCase):
             date.today())
 
 
+class ActiveSurveyModelTestCase(TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir)
+
+    @override_settings(SURVEY_ACTIVE_IDS_VERSION_CHECK_INTERVAL=0)
+    def test_ids_follow_changes_made_by_other_processes(self):
+        survey = create_test_survey_via_model()
+        shared_cache = {'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': self.cache_dir, }}
+        with override_settings(CACHES=shared_cache):
+            self.assertIn(survey.pk, ActiveSurveyModel.get_ids())
+            # Another process ends the survey, it shares the cache directory
+            # only and has a memo of its own.
+            ids_memo = ActiveSurveyModel.ids_memo
+            other_cache = FileBasedCache(self.cache_dir, {})
+            survey.end_date = date.today() - timedelta(days=1)
+            with mock.patch('api.survey.models.cache', other_cache):
+                survey.save()
+            ActiveSurveyModel.ids_memo = ids_memo
+            self.assertNotIn(survey.pk, ActiveSurveyModel.get_ids())
+
+    def test_version_checked_once_per_interval(self):
+        survey = create_test_survey_via_model()
+        self.assertIn(survey.pk, ActiveSurveyModel.get_ids())
+        with mock.patch('api.survey.models.cache') as cache, \
+                self.assertNumQueries(0):
+            for _ in range(10):
+                self.assertIn(survey.pk, ActiveSurveyModel.get_ids())
+        cache.get.assert_not_called()
+
+    @override_settings(SURVEY_ACTIVE_IDS_MEMO_TIMEOUT=0)
+    def test_ids_memo_expires(self):
+        survey = create_test_survey_via_model()
+        self.assertIn(survey.pk, ActiveSurveyModel.get_ids())
+        # A change which didn't reach the cache.
+        ActiveSurveyModel.objects.filter(survey=survey).delete()
+        self.assertNotIn(survey.pk, ActiveSurveyModel.get_ids())
+
+
 class QuestionModelTestCase(TestCase):
     def test_wrong_type(self):
         survey = create_test_survey_via_model()
@@ -78,8 +180,22 @@ class QuestionModelTestCase(TestCase):
             question.have_fake_answer,
             bool(ResponseOptionModel.objects.get(question=question)))
 
+    def test_published_queryset(self):
+        _, questions, _ = create_test_surveys_questions_and_response_options_via_model(
+            number_of_questions=1)
+        self.assertEqual(
+            set(QuestionModel.objects.published()),
+            {question for question in questions if question.is_published})
+
 
 class ResponseOptionModelTestCase(TestCase):
+    def test_published_queryset(self):
+        create_test_surveys_questions_and_response_options_via_model(
+            number_of_questions=1)
+        self.assertEqual(
+            set(ResponseOptionModel.objects.published()),
+            {option for option in ResponseOptionModel.objects.all() if option.is_published})
+
     def test_create_fake_answer_for_text_question(self):
         survey = create_test_survey_via_model()
         question = create_test_questions_via_model(survey, ("text",), 1)[0]
@@ -104,6 +220,36 @@ class ResponseOptionModelTestCase(TestCase):
             "Number of response option for test question was exceeded.")
 
 
+    def test_move_response_option_to_another_question(self):
+        surveys = [create_test_survey_via_model() for _ in range(2)]
+        one = create_test_questions_via_model(surveys[0], ("one",), 1)[0]
+        many = create_test_questions_via_model(surveys[1], ("many",), 1)[0]
+        response_option = create_test_response_options_via_model(one, 1)[0]
+        session = create_test_sessions_via_model(create_test_actors_via_model(1)[0], 1)[0]
+        answer_act = create_test_answer_act_via_model(session, response_option)
+
+        response_option.question = many
+        response_option.save()
+        answer_act.refresh_from_db()
+        self.assertEqual(
+            (answer_act.question_id, answer_act.question_type), (many.pk, "many"))
+        self.assertEqual(
+            list(SurveyCounterModel.objects.filter(survey__in=surveys)
+                 .order_by('survey').values_list('sessions', flat=True)),
+            [0, 1])
+        call_command('rebuild_counters', '--verify', stdout=StringIO())
+
+        # The session has answered the other option of the question already.
+        one_option = create_test_response_options_via_model(one, 1)[0]
+        create_test_answer_act_via_model(session, one_option)
+        response_option.question = one
+        self.assertRaises(NumberExcess, response_option.save)
+        answer_act.refresh_from_db()
+        self.assertEqual(answer_act.question_id, many.pk)
+        self.assertEqual(
+            ResponseOptionModel.objects.get(pk=response_option.pk).question_id, many.pk)
+
+
 class ActorModelTestCase(TestCase):
     def test_block_actor_unique_key(self):
         actor = create_test_actors_via_model(1)[0]
@@ -124,6 +270,32 @@ class ActorModelTestCase(TestCase):
             len(set(actor_keys)), len(actor_keys))
 
 
+class UniqueKeyTestCase(TestCase):
+    def test_uuid7_keys_are_time_ordered(self):
+        keys = [uuid7() for _ in range(5000)]
+        self.assertEqual(keys, sorted(keys))
+        self.assertEqual(len(set(keys)), len(keys))
+        for key in keys[:3]:
+            self.assertEqual(key.version, 7)
+            self.assertEqual(key.variant, uuid.RFC_4122)
+
+    def test_unique_key_version_setting(self):
+        with override_settings(SURVEY_UNIQUE_KEY_VERSION=7):
+            actor = create_test_actors_via_model(1)[0]
+            session = create_test_sessions_via_model(actor, 1)[0]
+        self.assertEqual(actor.unique_key.version, 7)
+        self.assertEqual(session.unique_key.version, 7)
+        self.assertEqual(create_test_actors_via_model(1)[0].unique_key.version, 4)
+
+    def test_benchmark_unique_keys_command(self):
+        out = StringIO()
+        call_command(
+            'benchmark_unique_keys', '--rows', '20', '--batch-size', '7', stdout=out)
+        self.assertIn('uuid4: ', out.getvalue())
+        self.assertIn('uuid7: ', out.getvalue())
+        self.assertFalse(ActorModel.objects.exists())
+
+
 class SessionModelTestCase(TestCase):
     def test_block_session_unique_key(self):
         actor = create_test_actors_via_model(1)[0]
@@ -148,6 +320,59 @@ class SessionModelTestCase(TestCase):
 
 
 class AnswerActTestCase(TestCase):
+    def test_save_answer_act_without_select_before_insert(self):
+        survey = create_test_survey_via_model()
+        question = create_test_questions_via_model(survey, ("one",), 1)[0]
+        response_option = create_test_response_options_via_model(question, 1)[0]
+        session = create_test_sessions_via_model(
+            create_test_actors_via_model(1)[0], 1)[0]
+
+        with CaptureQueriesContext(connection) as context:
+            answer_act = create_test_answer_act_via_model(session, response_option)
+        queries = [query['sql'] for query in context.captured_queries]
+        insert_index = [
+            index for index, query in enumerate(queries)
+            if query.startswith('INSERT INTO "api_answer_acts"')][0]
+        self.assertFalse(
+            [query for query in queries[:insert_index] if query.startswith('SELECT')])
+        self.assertEqual(answer_act.question, question)
+        self.assertEqual(answer_act.question_type, 'one')
+
+    def test_database_rejects_excess_answers(self):
+        survey = create_test_survey_via_model()
+        one_question, many_question = create_test_questions_via_model(
+            survey, ("one", "many"), 1)
+        session = create_test_sessions_via_model(
+            create_test_actors_via_model(1)[0], 1)[0]
+
+        for response_options in (
+                create_test_response_options_via_model(one_question, 2),
+                create_test_response_options_via_model(many_question, 1) * 2):
+            with self.assertRaises(IntegrityError), transaction.atomic():
+                AnswerActModel.objects.bulk_create([
+                    AnswerActModel(
+                        session=session, response=response_option,
+                        question=response_option.question,
+                        question_type=response_option.question_type)
+                    for response_option in response_options])
+
+    def test_change_question_type(self):
+        survey = create_test_survey_via_model()
+        question = create_test_questions_via_model(survey, ("many",), 1)[0]
+        response_options = create_test_response_options_via_model(question, 2)
+        session = create_test_sessions_via_model(
+            create_test_actors_via_model(1)[0], 1)[0]
+        create_test_answer_act_via_model(session, response_options[0])
+
+        question.type = "one"
+        question.save()
+        self.assertEqual(
+            set(AnswerActModel.objects.values_list('question_type', flat=True)),
+            {"one"})
+        self.assertRaises(
+            NumberExcess, create_test_answer_act_via_model,
+            session, ResponseOptionModel.objects.get(pk=response_options[1].pk))
+
     def test_one_answer_question_in_single_session(self):
         survey = create_test_survey_via_model()
         questions = create_test_questions_via_model(survey, ("one",), 3)
@@ -321,3 +546,152 @@ class AnswerActTestCase(TestCase):
                     session=session
                 ).count(),
                 ResponseOptionModel.objects.filter(question=question).count())
+
+
+class CounterTestCase(TestCase):
+    def setUp(self):
+        self.survey = create_test_survey_via_model()
+        questions = create_test_questions_via_model(
+            self.survey, ("one", "many", "text"), 2)
+        for question in questions:
+            if question.type != "text":
+                create_test_response_options_via_model(question, 3)
+        actor = create_test_actors_via_model(1)[0]
+        self.sessions = create_test_sessions_via_model(actor, 3)
+
+    def assertCountersConsistent(self):
+        for response_option in ResponseOptionModel.objects.select_related('counter'):
+            self.assertEqual(
+                response_option.counter.answers,
+                AnswerActModel.objects.filter(response=response_option).count())
+        self.assertEqual(
+            SurveyCounterModel.objects.get(survey=self.survey).sessions,
+            SessionModel.objects.filter(
+                answer_acts__question__survey=self.survey).distinct().count())
+
+    def test_counters_after_save(self):
+        create_test_answer_acts_via_model(
+            self.sessions[:2], ResponseOptionModel.objects.all())
+        self.assertCountersConsistent()
+        self.assertEqual(SurveyCounterModel.objects.get(survey=self.survey).sessions, 2)
+
+    def test_counters_after_bulk_create(self):
+        AnswerActModel.bulk_create_for_session(
+            self.sessions[0],
+            [AnswerActModel(response=response_option)
+             for response_option in ResponseOptionModel.objects.filter(question_type="many")])
+        self.assertCountersConsistent()
+        self.assertEqual(SurveyCounterModel.objects.get(survey=self.survey).sessions, 1)
+
+    def test_counters_after_delete(self):
+        create_test_answer_acts_via_model(
+            self.sessions, ResponseOptionModel.objects.all())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sessions[0].delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            AnswerActModel.objects.filter(session=self.sessions[1]).first().delete()
+        self.assertCountersConsistent()
+        self.assertEqual(SurveyCounterModel.objects.get(survey=self.survey).sessions, 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            AnswerActModel.objects.filter(session=self.sessions[1]).delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            ResponseOptionModel.objects.filter(question_type="many").first().delete()
+        self.assertCountersConsistent()
+        self.assertEqual(SurveyCounterModel.objects.get(survey=self.survey).sessions, 1)
+        call_command('rebuild_counters', '--verify', stdout=StringIO())
+
+    def test_delete_uncounts_answers_at_once(self):
+        create_test_answer_acts_via_model(
+            self.sessions[:1], ResponseOptionModel.objects.all())
+        # answers, deletion of answers and session, then after the commit in
+        # a transaction: response option counters, sessions of surveys left
+        # without answers, their deletion and survey counters
+        with self.assertNumQueries(9):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.sessions[0].delete()
+        self.assertCountersConsistent()
+        self.assertEqual(SurveyCounterModel.objects.get(survey=self.survey).sessions, 0)
+
+    def test_session_counted_once_by_concurrent_first_answers(self):
+        # Another batch of the session's answers marked it first.
+        SurveySessionModel.objects.create(session=self.sessions[0], survey=self.survey)
+        SurveyCounterModel.add({self.survey.pk: 1}, 1)
+        AnswerActModel.bulk_create_for_session(
+            self.sessions[0],
+            [AnswerActModel(response=ResponseOptionModel.objects.filter(question_type="one").first())])
+        self.assertCountersConsistent()
+
+    def test_counters_after_answer_change(self):
+        response_options = ResponseOptionModel.objects.filter(question_type="many")
+        answer_act = AnswerActModel(session=self.sessions[0], response=response_options[0])
+        answer_act.save()
+        answer_act.response = response_options[1]
+        answer_act.save()
+        self.assertCountersConsistent()
+
+        answer_act.session = self.sessions[1]
+        answer_act.save()
+        self.assertCountersConsistent()
+        self.assertEqual(SurveyCounterModel.objects.get(survey=self.survey).sessions, 1)
+        call_command('rebuild_counters', '--verify', stdout=StringIO())
+
+    def test_counters_after_question_move(self):
+        create_test_answer_acts_via_model(
+            self.sessions[:1], ResponseOptionModel.objects.filter(question_type="one"))
+        other_survey = create_test_survey_via_model()
+        for question in QuestionModel.objects.filter(survey=self.survey).exclude(type="one"):
+            question.survey = other_survey
+            question.save()
+        create_test_answer_acts_via_model(
+            self.sessions[1:2], ResponseOptionModel.objects.filter(question_type="many"))
+
+        question = QuestionModel.objects.filter(survey=self.survey).first()
+        question.survey = other_survey
+        question.save()
+        call_command('rebuild_counters', '--verify', stdout=StringIO())
+        self.assertEqual(self.survey.get_results()['sessions'], 1)
+        self.assertEqual(other_survey.get_results()['sessions'], 2)
+
+    def test_rebuild_counters_command(self):
+        create_test_answer_acts_via_model(
+            self.sessions, ResponseOptionModel.objects.all())
+        ResponseOptionCounterModel.objects.update(answers=0)
+        SurveyCounterModel.objects.all().delete()
+        self.assertRaises(
+            CommandError, call_command, 'rebuild_counters', '--verify', stdout=StringIO())
+
+        call_command('rebuild_counters', stdout=StringIO())
+        call_command('rebuild_counters', '--verify', stdout=StringIO())
+        self.assertCountersConsistent()
+
+
+class GenerateDataTestCase(TestCase):
+    def test_generate_data_command(self):
+        create_test_survey_via_model()
+        call_command(
+            'generate_data', '--surveys', '3', '--questions', '4', '--responses', '3',
+            '--actors', '20', '--sessions', '2', '--batch-size', '50', '--seed', '1',
+            stdout=StringIO())
+        self.assertEqual(SurveyModel.objects.count(), 4)
+        self.assertEqual(ActiveSurveyModel.objects.count(), 4)
+        self.assertEqual(SessionModel.objects.count(), 40)
+        self.assertEqual(
+            ResponseOptionModel.objects.filter(question_type='text').count(),
+            QuestionModel.objects.filter(type='text').count())
+        self.assertFalse(
+            AnswerActModel.objects.exclude(question_type=F('question__type')).exists())
+        self.assertFalse(
+            AnswerActModel.objects.exclude(question=F('response__question')).exists())
+        self.assertFalse(
+            AnswerActModel.objects.filter(question_type__in=['one', 'text'])
+            .values('session', 'question').annotate(number=Count('pk'))
+            .filter(number__gt=1).exists())
+        for session in SessionModel.objects.all()[:5]:
+            self.assertEqual(
+                QuestionModel.objects.filter(answer_acts__session=session).distinct().count(), 4)
+        call_command('rebuild_counters', '--verify', stdout=StringIO())
+
+        # Objects created afterwards get fresh pks.
+        survey = create_test_survey_via_model()
+        self.assertEqual(survey.pk, 5)
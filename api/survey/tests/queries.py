@@ -0,0 +1,209 @@
+from unittest import skipUnless
+
+from asgiref.sync import sync_to_async
+from django.db import connection
+from django.test import override_settings
+from django.test.testcases import TestCase
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from ..benchmarks import Benchmark
+from ..urls import router
+from ..viewsets import ActorViewset, AnswerActViewset, SurveyViewset
+from .utils import *
+
+
+class QueryBudgetTestCase(SurveyTreeTestData, TestCase):
+    number_of_questions = 2
+    budgets = {
+        'api-root': 0,
+        'surveymodel-list': 3,
+        'surveymodel-detail': 2,
+        'questionmodel-list': 3,
+        'questionmodel-detail': 2,
+        'responseoptionmodel-list': 2,
+        'responseoptionmodel-detail': 1,
+        'actormodel-list': 3,
+        'actormodel-detail': 2,
+        'actormodel-sessions': 3,
+        'sessionmodel-list': 3,
+        'sessionmodel-detail': 2,
+        'answeractmodel-list': 2,
+        'answeractmodel-detail': 1,
+        'answeractmodel-bulk': 14,
+        'surveymodel-results': 3,
+        'surveymodel-export': 2,
+        'surveymodel-bootstrap': 7,
+        'surveymodel-questions': 3,
+    }
+    # Budgets of these routes don't include the 2 queries of staff authentication.
+    staff_routes = {'surveymodel-results', 'surveymodel-export'}
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        create_test_admin()
+        cls.actors, cls.sessions, cls.answers = \
+            create_test_actors_sessions_and_answers_via_api()
+
+    def get_requests(self) -> dict:
+        survey = SurveyModel.objects.published().first()
+        question = QuestionModel.objects.published().first()
+        response_option = ResponseOptionModel.objects.published().first()
+        actor, session, answer = self.actors[0], self.sessions[0], self.answers[0]
+        new_session = create_test_sessions_via_model(actor, 1)[0]
+        return {
+            'api-root': ('get', '/api/v1/', {}),
+            'surveymodel-list': ('get', '/api/v1/surveys/', {}),
+            'surveymodel-detail': ('get', f'/api/v1/surveys/{survey.pk}/', {}),
+            'questionmodel-list': ('get', '/api/v1/questions/', {}),
+            'questionmodel-detail': ('get', f'/api/v1/questions/{question.pk}/', {}),
+            'responseoptionmodel-list': ('get', '/api/v1/responses/', {}),
+            'responseoptionmodel-detail': (
+                'get', f'/api/v1/responses/{response_option.pk}/', {}),
+            'actormodel-list': ('post', '/api/v1/actors/', {}),
+            'actormodel-detail': ('get', f'/api/v1/actors/{actor.pk}/', {}),
+            'actormodel-sessions': ('get', f'/api/v1/actors/{actor.pk}/sessions/', {}),
+            'sessionmodel-list': (
+                'post', '/api/v1/sessions/',
+                {'data': {'actor': f'http://testserver/api/v1/actors/{actor.pk}/'}}),
+            'sessionmodel-detail': ('get', f'/api/v1/sessions/{session.pk}/', {}),
+            'answeractmodel-list': ('get', f'/api/v1/answers/?session={session.pk}', {}),
+            'answeractmodel-detail': (
+                'get', f'/api/v1/answers/{answer.pk}/?session={session.pk}', {}),
+            'answeractmodel-bulk': (
+                'post', '/api/v1/answers/bulk/',
+                {'data': {
+                    'session': f'http://testserver/api/v1/sessions/{new_session.pk}/',
+                    'answers': [
+                        {'response': f'http://testserver/api/v1/responses/{answer.response_id}/'}
+                        for answer in self.answers], },
+                 'content_type': 'application/json'}),
+            'surveymodel-results': ('get', f'/api/v1/surveys/{survey.pk}/results/', {}),
+            'surveymodel-export': ('get', f'/api/v1/surveys/{survey.pk}/export/', {}),
+            'surveymodel-bootstrap': ('post', f'/api/v1/surveys/{survey.pk}/bootstrap/', {}),
+            'surveymodel-questions': ('get', f'/api/v1/surveys/{survey.pk}/questions/', {}),
+        }
+
+    def test_every_route_has_budget(self):
+        self.assertEqual(
+            {url.name for url in router.urls},
+            set(self.budgets))
+        self.assertEqual(
+            set(self.get_requests()),
+            set(self.budgets))
+
+    def test_query_budgets(self):
+        ActiveSurveyModel.get_ids()  # memoized until surveys change
+        for name, (method, path, kwargs) in self.get_requests().items():
+            with self.subTest(route=name):
+                budget = self.budgets[name]
+                if name in self.staff_routes:
+                    self.client.login(username='admin', password='admin')
+                    budget += 2
+                response, stats = request_with_query_stats(
+                    self.client, method, path, **kwargs)
+                self.client.logout()
+                self.assertLess(
+                    response.status_code, 400, f'{method.upper()} {path} failed.')
+                self.assertLessEqual(
+                    stats.queries, budget,
+                    f'{method.upper()} {path} exceeds its query budget.')
+
+
+class QueryStatsMiddlewareTestCase(TestCase):
+    @override_settings(DEBUG=True)
+    def test_headers_in_debug(self):
+        create_test_surveys_via_model()
+        ActiveSurveyModel.get_ids()
+        response, stats = request_with_query_stats(self.client, 'get', '/api/v1/surveys/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-DB-Queries'], '3')
+        # Recordings nest.
+        self.assertEqual(stats.queries, 3)
+        self.assertIn('X-DB-Time', response)
+        self.assertIn('X-Serialization-Time', response)
+
+    @override_settings(DEBUG=True)
+    async def test_headers_in_debug_under_asgi(self):
+        await sync_to_async(create_test_surveys_via_model)()
+        await sync_to_async(ActiveSurveyModel.get_ids)()
+        response = await self.async_client.get(path='/api/v1/surveys/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-DB-Queries'], '3')
+
+    def test_log_line_in_production(self):
+        create_test_surveys_via_model()
+        with self.assertLogs('api.survey.utils.middleware', level='INFO') as logs:
+            response = self.client.get(path='/api/v1/surveys/')
+        self.assertNotIn('X-DB-Queries', response)
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn('GET /api/v1/surveys/ 200 queries=', logs.output[0])
+
+
+class BenchmarkTestCase(TestCase):
+    def test_benchmark_scenarios(self):
+        report = Benchmark(
+            scale=1, questions=1, responses=2, sessions=2, requests=3, warmup=1).run()
+        self.assertEqual(
+            set(report['results']),
+            {'survey-list', 'survey-retrieve', 'question-retrieve',
+             'session-create', 'answer-create'})
+        for name, result in report['results'].items():
+            with self.subTest(scenario=name):
+                self.assertEqual(result['requests'], 3)
+                self.assertEqual(result['errors'], 0)
+                self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+        # The survey document is cached by the warmup request.
+        self.assertEqual(report['results']['survey-retrieve']['queries_max'], 0)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Query plans are checked via SQLite EXPLAIN QUERY PLAN.')
+class AnswerActIndexTestCase(TestCase):
+    def explain_answer_acts_list(self, query_params: dict) -> str:
+        view = AnswerActViewset(action='list', format_kwarg=None)
+        view.request = Request(
+            APIRequestFactory().get('/api/v1/answers/', query_params))
+        return view.get_queryset().explain()
+
+    def test_filters_use_indexes(self):
+        actor = create_test_actors_via_model(1)[0]
+        session = create_test_sessions_via_model(actor, 1)[0]
+        for query_params, index in (
+                ({'actor': actor.pk}, 'api_answer_session_time_idx'),
+                ({'session': session.pk}, 'api_answer_session_time_idx'),
+                ({'question': 1}, 'api_answer_question_time_idx'),):
+            with self.subTest(query_params=query_params):
+                plan = self.explain_answer_acts_list(query_params)
+                self.assertIn(f'api_answer_acts USING INDEX {index}', plan)
+                self.assertNotIn('SCAN api_answer_acts', plan)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Query plans are checked via SQLite EXPLAIN QUERY PLAN.')
+class NestedCollectionIndexTestCase(TestCase):
+    def test_capped_collections_use_indexes(self):
+        actor = create_test_actors_via_model(1)[0]
+        for viewset, parent_filter, index in (
+                (SurveyViewset, {'survey__in': [1]}, 'api_question_survey_id_idx'),
+                (ActorViewset, {'actor__in': [actor.pk]}, 'api_session_actor_key_idx'),):
+            with self.subTest(viewset=viewset.__name__):
+                prefetch = viewset.prefetch_related[0]
+                plan = prefetch.queryset.filter(**parent_filter).explain()
+                self.assertIn(index, plan)
+                # Siblings are neither scanned nor sorted.
+                self.assertNotIn('SCAN', plan)
+                self.assertNotIn('TEMP B-TREE', plan)
+
+
+class NestedNextLinkTestCase(TestCase):
+    def test_next_links_use_prefetches(self):
+        for survey in [create_test_survey_via_model() for _ in range(5)]:
+            create_test_questions_via_model(survey, ('one',), 1)
+        ActiveSurveyModel.get_ids()
+        for fields in ('pk,questions', 'pk,questions_next'):
+            with self.subTest(fields=fields):
+                response, stats = request_with_query_stats(
+                    self.client, 'get', f'/api/v1/surveys/?fields={fields}')
+                self.assertEqual(response.status_code, 200, response.content)
+                self.assertEqual(len(response.data['results']), 5)
+                self.assertEqual(stats.queries, 3)
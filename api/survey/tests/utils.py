@@ -2,9 +2,13 @@ from typing import Iterable, List
 from datetime import date, timedelta
 
 from django.contrib.auth import models
+from django.core.cache import cache
+from django.db.models import Max
 from django.test.client import Client
 
+from .. import documents
 from ..models import *
+from ..utils.middleware import QueryStats
 
 
 def create_test_actors_via_model(count: int, user: models.User = None) -> List[ActorModel]:
@@ -113,33 +117,67 @@ def create_test_answer_acts_via_model(sessions: Iterable[SessionModel], response
     return answer_acts
 
 
+def bulk_create_via_model(model, objects: List) -> List:
+    """Inserts ``objects`` with one ``bulk_create`` and returns them fetched
+    back in order, since SQLite doesn't return pks of bulk inserts."""
+    last_pk = model.objects.aggregate(last_pk=Max('pk'))['last_pk'] or 0
+    model.objects.bulk_create(objects)
+    return list(model.objects.filter(pk__gt=last_pk).order_by('pk'))
+
+
 def create_test_surveys_questions_and_response_options_via_model(number_of_questions: int = 3, number_of_responses: int = 3):
+    """Creates the test surveys with questions of every type and response
+    options. Questions and options are bulk inserted along with what their
+    ``save`` would add: fake options of text questions and answer counters."""
     surveys = create_test_surveys_via_model()
 
-    questions: List[QuestionModel] = []
+    questions: List[QuestionModel] = bulk_create_via_model(QuestionModel, [
+        QuestionModel(
+            survey=survey,
+            type=type,
+            content=f"Test question (type:{type}, survey:{survey})")
+        for survey in surveys
+        for type in ("one", "many", "text")
+        for _ in range(number_of_questions)])
+
+    options = [
+        ResponseOptionModel(
+            question=question, question_type=question.type,
+            content=f"Answer #{i} for question (type:{question.type})")
+        for question in questions if question.type != "text"
+        for i in range(number_of_responses)]
+    fake_options = [
+        ResponseOptionModel(
+            question=question, question_type=question.type, content='fake_answer')
+        for question in questions if question.type == "text"]
+    responses: List[ResponseOptionModel] = bulk_create_via_model(
+        ResponseOptionModel, fake_options + options)
+    ResponseOptionCounterModel.objects.bulk_create([
+        ResponseOptionCounterModel(response_option=response) for response in responses])
+
     for survey in surveys:
-            questions.extend(create_test_questions_via_model(
-                survey, ("one", "many", "text"), number_of_questions))
+        documents.invalidate(survey.pk)
+    return surveys, questions, responses[len(fake_options):]
 
-    responses: List[ResponseOptionModel] = []
-    for question in questions:
-        if question.type != "text":
-            responses.extend(
-                create_test_response_options_via_model(question, number_of_responses))
 
-    # n_Q = {
-    #     "text": Question.objects.filter(type="text").count(),
-    #     "many": Question.objects.filter(type="many").count(),
-    #     "one": Question.objects.filter(type="one").count(),
-    # }
+class SurveyTreeTestData:
+    """Test case mixin which builds the test surveys with questions and
+    response options once per class. Caches outlive the rollback of every
+    test, so they are cleared before each one."""
+    number_of_questions: int = 1
+    number_of_responses: int = 3
 
-    # n_R = {
-    #     "text": ResponseOption.objects.filter(question__type="text").count(),
-    #     "many": ResponseOption.objects.filter(question__type="many").count(),
-    #     "one": ResponseOption.objects.filter(question__type="one").count(),
-    # }
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.surveys, cls.questions, cls.responses = \
+            create_test_surveys_questions_and_response_options_via_model(
+                number_of_questions=cls.number_of_questions,
+                number_of_responses=cls.number_of_responses)
 
-    return surveys, questions, responses
+    def setUp(self):
+        super().setUp()
+        cache.clear()
 
 
 def create_test_admin(username="admin", password="admin"):
@@ -171,4 +209,12 @@ def create_test_actors_sessions_and_answers_via_api(user: models.User = None):
         sessions.extend(create_test_sessions_via_model(actor, 1))
     answers = create_test_answer_acts_via_model(
         sessions, ResponseOptionModel.objects.all())
-    return actors, sessions, answers
\ No newline at end of file
+    return actors, sessions, answers
+
+
+def request_with_query_stats(client: Client, method: str, path: str, **kwargs):
+    with QueryStats().record() as stats:
+        response = getattr(client, method)(path=path, **kwargs)
+        if response.streaming:
+            response.streamed_content = b''.join(response.streaming_content)
+    return response, stats
@@ -1,14 +1,390 @@
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
+from io import StringIO
+import json
+import os
+import shutil
+import tempfile
+from unittest import mock
+import uuid
 
-from django.test.testcases import TestCase
+from asgiref.sync import sync_to_async
 
+from django.core.cache import cache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.testcases import LiveServerTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .. import documents, ingestion
+from ..utils.relations import resolve_url
 from .utils import *
 
 
 class SurveyViewsetTestCase(TestCase):
+    def test_list_surveys_count_by_anon(self):
+        surveys = create_test_surveys_via_model()
+        response = self.client.get(path='/api/v1/surveys/')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(
+            response.data['count'],
+            len([survey for survey in surveys if survey.is_published]))
+
+    def test_list_surveys_keyset_pagination_staff(self):
+        create_test_surveys_via_model()
+        create_test_survey_via_model()
+        create_test_admin()
+        self.assertTrue(
+            self.client.login(username='admin', password='admin'))
+
+        pages = []
+        page_url = '/api/v1/surveys/'
+        while page_url:
+            response = self.client.get(path=page_url)
+            self.assertEqual(response.status_code, 200, response.data)
+            pages.append([survey['pk'] for survey in response.data['results']])
+            page_url = response.data['next']
+        self.assertGreater(len(pages), 1)
+        self.assertEqual(
+            [pk for page in pages for pk in page],
+            [survey.pk for survey in sorted(
+                SurveyModel.objects.all(),
+                key=lambda survey: (survey.begin_date is not None, survey.begin_date or date.min, survey.pk))])
+
+        response = self.client.get(path=response.data['previous'])
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(
+            [survey['pk'] for survey in response.data['results']], pages[-2])
+        self.assertIsNone(response.data['previous'])
+
+    def test_list_surveys_without_count_anon(self):
+        create_test_surveys_via_model()
+        ActiveSurveyModel.get_ids()  # memoized until surveys change
+        with self.assertNumQueries(2):
+            response = self.client.get(path='/api/v1/surveys/?count=false')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertNotIn('count', response.data)
+
+    def test_retrieve_survey_query_count_anon(self):
+        survey = create_test_survey_via_model()
+        create_test_questions_via_model(survey, ("one", "many", "text"), 5)
+        ActiveSurveyModel.get_ids()  # memoized until surveys change
+        # survey, prefetched questions
+        with self.assertNumQueries(2):
+            response = self.client.get(path=f'/api/v1/surveys/{survey.pk}/')
+        self.assertEqual(response.status_code, 200, response.data)
+
+    def test_retrieve_cached_survey_anon(self):
+        cache.clear()
+        survey = create_test_survey_via_model()
+        create_test_questions_via_model(survey, ("one",), 1)
+        first = self.client.get(path=f'/api/v1/surveys/{survey.pk}/')
+        with self.assertNumQueries(0):
+            second = self.client.get(path=f'/api/v1/surveys/{survey.pk}/')
+        self.assertEqual(second.status_code, 200, second.data)
+        self.assertEqual(second.data, first.data)
+
+        create_test_questions_via_model(survey, ("text",), 1)
+        response = self.client.get(path=f'/api/v1/surveys/{survey.pk}/')
+        self.assertEqual(len(response.data['questions']), 2)
+
+    def test_retrieve_cached_survey_after_move_anon(self):
+        cache.clear()
+        surveys = [create_test_survey_via_model() for _ in range(2)]
+        question = create_test_questions_via_model(surveys[0], ("many",), 1)[0]
+        create_test_questions_via_model(surveys[1], ("many",), 1)
+        paths = [f'/api/v1/surveys/{survey.pk}/' for survey in surveys]
+        for path in paths:
+            self.client.get(path=path)
+
+        question.survey = surveys[1]
+        question.save()
+        response = self.client.get(path=paths[0])
+        self.assertEqual(response.data['questions'], [])
+        response = self.client.get(path=paths[1])
+        self.assertEqual(len(response.data['questions']), 2)
+
+    def test_retrieve_missing_survey_not_cached_anon(self):
+        cache.clear()
+        for pk in range(1000, 1005):
+            response = self.client.get(path=f'/api/v1/surveys/{pk}/')
+            self.assertEqual(response.status_code, 404)
+            self.assertIsNone(cache.get(documents.get_version_key(pk)))
+
+    def test_retrieve_survey_changed_by_other_process_anon(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        survey = create_test_survey_via_model()
+        shared_cache = {'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': cache_dir, }}
+        with override_settings(CACHES=shared_cache):
+            response = self.client.get(path=f'/api/v1/surveys/{survey.pk}/')
+            self.assertEqual(response.data['header'], survey.header)
+            # Another process changes the survey, it shares the cache directory only.
+            other_cache = FileBasedCache(cache_dir, {})
+            survey.header = 'Changed survey'
+            with mock.patch('api.survey.documents.cache', other_cache), \
+                    mock.patch('api.survey.models.cache', other_cache):
+                survey.save()
+            response = self.client.get(path=f'/api/v1/surveys/{survey.pk}/')
+            self.assertEqual(response.data['header'], 'Changed survey')
+
+    def test_retrieve_cached_survey_after_end_date_anon(self):
+        cache.clear()
+        survey = create_test_survey_via_model(end_date=date.today())
+        response = self.client.get(path=f'/api/v1/surveys/{survey.pk}/')
+        self.assertEqual(response.status_code, 200, response.data)
+
+        # Publication ends without any save, so the document stays cached.
+        ActiveSurveyModel.refresh(date.today() + timedelta(days=1))
+        response = self.client.get(path=f'/api/v1/surveys/{survey.pk}/')
+        self.assertEqual(response.status_code, 403)
+
+    def test_retrieve_survey_conditionally_anon(self):
+        survey = create_test_survey_via_model()
+        response = self.client.get(path=f'/api/v1/surveys/{survey.pk}/')
+        self.assertEqual(response.status_code, 200, response.data)
+        etag = response['ETag']
+
+        # survey version only
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                path=f'/api/v1/surveys/{survey.pk}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+
+        create_test_questions_via_model(survey, ("one",), 1)
+        response = self.client.get(
+            path=f'/api/v1/surveys/{survey.pk}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.data['questions']), 1)
+
+    def test_retrieve_unpublished_survey_conditionally_anon(self):
+        survey = create_test_survey_via_model(
+            end_date=date.today() - timedelta(days=1))
+        create_test_admin()
+        self.client.login(username='admin', password='admin')
+        etag = self.client.get(path=f'/api/v1/surveys/{survey.pk}/')['ETag']
+        self.client.logout()
+        response = self.client.get(
+            path=f'/api/v1/surveys/{survey.pk}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 403)
+
+    def test_retrieve_conditionally_after_move_anon(self):
+        surveys = [create_test_survey_via_model() for _ in range(2)]
+        questions = [
+            create_test_questions_via_model(survey, ("many",), 1)[0] for survey in surveys]
+        response_option = create_test_response_options_via_model(questions[0], 1)[0]
+        question_path = f'/api/v1/questions/{questions[0].pk}/'
+        etag = self.client.get(path=question_path)['ETag']
+        response_option.question = questions[1]
+        response_option.save()
+        response = self.client.get(path=question_path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        survey_path = f'/api/v1/surveys/{surveys[0].pk}/'
+        etag = self.client.get(path=survey_path)['ETag']
+        questions[0].survey = surveys[1]
+        questions[0].save()
+        response = self.client.get(path=survey_path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_bootstrap_survey_anon(self):
+        cache.clear()
+        survey = create_test_survey_via_model()
+        question = create_test_questions_via_model(survey, ("many",), 1)[0]
+        response_options = create_test_response_options_via_model(question, 2)
+        response = self.client.post(path=f'/api/v1/surveys/{survey.pk}/bootstrap/?fields=pk')
+        self.assertEqual(response.status_code, 201, response.data)
+        session = SessionModel.objects.get(pk=response.data['session']['pk'])
+        self.assertEqual(
+            response.data['session']['actor']['pk'], str(session.actor_id))
+        self.assertEqual(response.data['survey']['header'], survey.header)
+        self.assertEqual(
+            [option['pk'] for option in response.data['survey']['questions'][0]['response_options']],
+            [response_option.pk for response_option in response_options])
+
+        ActiveSurveyModel.get_ids()  # memoized until surveys change
+        # cached document, actor and session inserts within a savepoint
+        with self.assertNumQueries(4):
+            second = self.client.post(path=f'/api/v1/surveys/{survey.pk}/bootstrap/')
+        self.assertEqual(second.status_code, 201, second.data)
+        self.assertEqual(second.data['survey'], response.data['survey'])
+        self.assertNotEqual(second.data['session'], response.data['session'])
+
+    def test_bootstrap_unpublished_survey_anon(self):
+        survey = create_test_survey_via_model(
+            end_date=date.today() - timedelta(days=1))
+        response = self.client.post(path=f'/api/v1/surveys/{survey.pk}/bootstrap/')
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(SessionModel.objects.exists())
+        response = self.client.post(path=f'/api/v1/surveys/{survey.pk + 1}/bootstrap/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_retrieve_survey_with_fields_and_expand_anon(self):
+        survey = create_test_survey_via_model()
+        questions = create_test_questions_via_model(survey, ("one",), 2)
+        response = self.client.get(
+            path=f'/api/v1/surveys/{survey.pk}/?fields=pk,questions&expand=')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(list(response.data), ['pk', 'questions'])
+        self.assertEqual(
+            response.data['questions'],
+            [f'http://testserver/api/v1/questions/{question.pk}/'
+             for question in questions])
+
+        response = self.client.get(path='/api/v1/surveys/?fields=pk,header')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(list(response.data['results'][0]), ['pk', 'header'])
+
+    def test_retrieve_survey_with_paged_questions_anon(self):
+        survey = create_test_survey_via_model()
+        questions = create_test_questions_via_model(survey, ("one", "many"), 8)
+        response = self.client.get(path=f'/api/v1/surveys/{survey.pk}/')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(
+            [question['pk'] for question in response.data['questions']],
+            [question.pk for question in questions[:10]])
+
+        page_url = response.data['questions_next']
+        self.assertTrue(page_url.startswith(
+            f'http://testserver/api/v1/surveys/{survey.pk}/questions/?cursor='))
+        response = self.client.get(path=page_url)
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['count'], len(questions))
+        self.assertEqual(
+            [question['pk'] for question in response.data['results']],
+            [question.pk for question in questions[10:]])
+        self.assertIsNone(response.data['next'])
+
+        create_test_questions_via_model(
+            create_test_survey_via_model(), ("one",), 10)
+        response = self.client.get(path=f'/api/v1/surveys/{survey.pk + 1}/')
+        self.assertEqual(len(response.data['questions']), 10)
+        self.assertIsNone(response.data['questions_next'])
+
+    def test_list_questions_of_unpublished_survey_anon(self):
+        survey = create_test_survey_via_model(end_date=date.today() - timedelta(days=1))
+        response = self.client.get(path=f'/api/v1/surveys/{survey.pk}/questions/')
+        self.assertEqual(response.status_code, 403)
+
+    def test_results_staff(self):
+        survey = create_test_survey_via_model()
+        questions = create_test_questions_via_model(survey, ("one", "many", "text"), 1)
+        response_options: List[ResponseOptionModel] = []
+        for question in questions:
+            if question.type != "text":
+                response_options.extend(
+                    create_test_response_options_via_model(question, 2))
+        actor = create_test_actors_via_model(1)[0]
+        sessions = create_test_sessions_via_model(actor, 3)
+        create_test_answer_acts_via_model(
+            sessions, ResponseOptionModel.objects.filter(question__survey=survey))
+        create_test_admin()
+        self.assertTrue(
+            self.client.login(username='admin', password='admin'))
+
+        with self.assertNumQueries(5):  # session, user, survey, results, sessions
+            response = self.client.get(path=f'/api/v1/surveys/{survey.pk}/results/')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(
+            [question['pk'] for question in response.data['questions']],
+            [question.pk for question in questions])
+        for question in response.data['questions']:
+            self.assertEqual(
+                question['answers'],
+                AnswerActModel.objects.filter(question=question['pk']).count())
+            if question['type'] == 'text':
+                self.assertEqual(question['response_options'], [])
+            for response_option in question['response_options']:
+                answers = AnswerActModel.objects.filter(
+                    response=response_option['pk']).count()
+                self.assertEqual(response_option['answers'], answers)
+                self.assertEqual(
+                    response_option['percentage'],
+                    round(100 * answers / question['answers'], 2))
+
+    def test_export_anon(self):
+        survey = create_test_survey_via_model()
+        response = self.client.get(path=f'/api/v1/surveys/{survey.pk}/export/')
+        self.assertEqual(response.status_code, 403)
+
+    def test_results_anon(self):
+        survey = create_test_survey_via_model()
+        response = self.client.get(path=f'/api/v1/surveys/{survey.pk}/results/')
+        self.assertEqual(response.status_code, 403, response.data)
+
+    def test_post_surveys_staff(self):
+        create_test_admin()
+        self.assertTrue(
+            self.client.login(username='admin', password='admin'))
+        for begin_deltaday in range(-1, 2, 1):
+            for end_deltaday in range(begin_deltaday, begin_deltaday + 2, 1):
+                response = self.client.post(path='/api/v1/surveys/', data={
+                    'header': 'Test survey header',
+                    'description': 'test survey desctiprion',
+                    'begin_date': str(date.today() + timedelta(days=begin_deltaday)),
+                    'end_date': str(date.today() + timedelta(days=end_deltaday)), })
+                self.assertEqual(
+                    response.status_code,
+                    201, response.data)
+
+        for end_deltaday in range(-1, 2, 1):
+            response = self.client.post(path='/api/v1/surveys/', data={
+                'header': 'Test survey header',
+                'description': 'test survey desctiprion',
+                'end_date': str(date.today() + timedelta(days=end_deltaday)), })
+            self.assertEqual(
+                response.status_code,
+                201, response.data)
+
+        for begin_deltaday in range(-1, 2, 1):
+            response = self.client.post(path='/api/v1/surveys/', data={
+                'header': 'Test survey header',
+                'description': 'test survey desctiprion',
+                'begin_date': str(date.today() + timedelta(days=begin_deltaday)), })
+            self.assertEqual(
+                response.status_code,
+                201, response.data)
+
+    def test_post_surveys_staff(self):
+        for begin_deltaday in range(-1, 2, 1):
+            for end_deltaday in range(begin_deltaday, begin_deltaday + 2, 1):
+                response = self.client.post(path='/api/v1/surveys/', data={
+                    'header': 'Test survey header',
+                    'description': 'test survey desctiprion',
+                    'begin_date': str(date.today() + timedelta(days=begin_deltaday)),
+                    'end_date': str(date.today() + timedelta(days=end_deltaday)), })
+                self.assertEqual(
+                    response.status_code,
+                    403, response.data)
+
+        for end_deltaday in range(-1, 2, 1):
+            response = self.client.post(path='/api/v1/surveys/', data={
+                'header': 'Test survey header',
+                'description': 'test survey desctiprion',
+                'end_date': str(date.today() + timedelta(days=end_deltaday)), })
+            self.assertEqual(
+                response.status_code,
+                403, response.data)
+
+        for begin_deltaday in range(-1, 2, 1):
+            response = self.client.post(path='/api/v1/surveys/', data={
+                'header': 'Test survey header',
+                'description': 'test survey desctiprion',
+                'begin_date': str(date.today() + timedelta(days=begin_deltaday)), })
+            self.assertEqual(
+                response.status_code,
+                403, response.data)
+
+
+class SurveyTreeViewsetTestCase(SurveyTreeTestData, TestCase):
     def test_list_surveys_by_anon(self):
-        create_test_surveys_questions_and_response_options_via_model(
-            number_of_questions=1)
         page_url = '/api/v1/surveys/'
         while page_url:
             response = self.client.get(path=page_url)
@@ -27,8 +403,6 @@ class SurveyViewsetTestCase(TestCase):
             page_url = response.data['next']
 
     def test_list_surveys_staff(self):
-        create_test_surveys_questions_and_response_options_via_model(
-            number_of_questions=1)
         create_test_admin()
         self.assertTrue(
             self.client.login(username='admin', password='admin'))
@@ -51,8 +425,6 @@ class SurveyViewsetTestCase(TestCase):
             page_url = response.data['next']
 
     def test_retrieve_survey_anon(self):
-        create_test_surveys_questions_and_response_options_via_model(
-            number_of_questions=1)
         for db_survey in SurveyModel.objects.all():
             response = self.client.get(path=f'/api/v1/surveys/{db_survey.pk}/')
             if db_survey.is_published:
@@ -75,8 +447,6 @@ class SurveyViewsetTestCase(TestCase):
                 self.assertEqual(response.status_code, 403)
 
     def test_retrieve_survey_staff(self):
-        create_test_surveys_questions_and_response_options_via_model(
-            number_of_questions=1)
         create_test_admin()
         self.assertTrue(
             self.client.login(username='admin', password='admin'))
@@ -90,74 +460,96 @@ class SurveyViewsetTestCase(TestCase):
                 len(response.data['questions']),
                 QuestionModel.objects.filter(survey=db_survey.pk).count())
 
-    def test_post_surveys_staff(self):
+    def test_export_staff(self):
+        surveys = self.surveys
+        actors, sessions, answers = create_test_actors_sessions_and_answers_via_api()
+        survey = surveys[0]
         create_test_admin()
         self.assertTrue(
             self.client.login(username='admin', password='admin'))
-        for begin_deltaday in range(-1, 2, 1):
-            for end_deltaday in range(begin_deltaday, begin_deltaday + 2, 1):
-                response = self.client.post(path='/api/v1/surveys/', data={
-                    'header': 'Test survey header',
-                    'description': 'test survey desctiprion',
-                    'begin_date': str(date.today() + timedelta(days=begin_deltaday)),
-                    'end_date': str(date.today() + timedelta(days=end_deltaday)), })
-                self.assertEqual(
-                    response.status_code,
-                    201, response.data)
 
-        for end_deltaday in range(-1, 2, 1):
-            response = self.client.post(path='/api/v1/surveys/', data={
-                'header': 'Test survey header',
-                'description': 'test survey desctiprion',
-                'end_date': str(date.today() + timedelta(days=end_deltaday)), })
+        response = self.client.get(path=f'/api/v1/surveys/{survey.pk}/export/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(
+            lines[0], 'session,actor,question,response,content,create_time')
+        survey_answers = [
+            answer for answer in answers if answer.question.survey == survey]
+        self.assertEqual(len(lines) - 1, len(survey_answers))
+        for line, answer in zip(lines[1:], survey_answers):
+            session, actor, question, response_option, _, _ = line.split(',')
+            self.assertEqual(session, str(answer.session.pk))
+            self.assertEqual(actor, str(answer.session.actor.pk))
+            self.assertEqual(question, str(answer.question.pk))
             self.assertEqual(
-                response.status_code,
-                201, response.data)
+                response_option,
+                '' if answer.question_type == 'text' else str(answer.response.pk))
 
-        for begin_deltaday in range(-1, 2, 1):
-            response = self.client.post(path='/api/v1/surveys/', data={
-                'header': 'Test survey header',
-                'description': 'test survey desctiprion',
-                'begin_date': str(date.today() + timedelta(days=begin_deltaday)), })
-            self.assertEqual(
-                response.status_code,
-                201, response.data)
 
-    def test_post_surveys_staff(self):
-        for begin_deltaday in range(-1, 2, 1):
-            for end_deltaday in range(begin_deltaday, begin_deltaday + 2, 1):
-                response = self.client.post(path='/api/v1/surveys/', data={
-                    'header': 'Test survey header',
-                    'description': 'test survey desctiprion',
-                    'begin_date': str(date.today() + timedelta(days=begin_deltaday)),
-                    'end_date': str(date.today() + timedelta(days=end_deltaday)), })
-                self.assertEqual(
-                    response.status_code,
-                    403, response.data)
+class QuestionViewsetTestCase(TestCase):
+    def test_list_questions_query_count_anon(self):
+        create_test_surveys_questions_and_response_options_via_model(
+            number_of_questions=3, number_of_responses=5)
+        ActiveSurveyModel.get_ids()  # memoized until surveys change
+        # count, page of questions, prefetched response options
+        with self.assertNumQueries(3):
+            response = self.client.get(path='/api/v1/questions/')
+        self.assertEqual(response.status_code, 200, response.data)
 
-        for end_deltaday in range(-1, 2, 1):
-            response = self.client.post(path='/api/v1/surveys/', data={
-                'header': 'Test survey header',
-                'description': 'test survey desctiprion',
-                'end_date': str(date.today() + timedelta(days=end_deltaday)), })
-            self.assertEqual(
-                response.status_code,
-                403, response.data)
+    def test_get_question_conditionally_anon(self):
+        survey = create_test_survey_via_model()
+        question = create_test_questions_via_model(survey, ("one",), 1)[0]
+        response = self.client.get(path=f'/api/v1/questions/{question.pk}/')
+        self.assertEqual(response.status_code, 200, response.data)
+        last_modified = response['Last-Modified']
 
-        for begin_deltaday in range(-1, 2, 1):
-            response = self.client.post(path='/api/v1/surveys/', data={
-                'header': 'Test survey header',
-                'description': 'test survey desctiprion',
-                'begin_date': str(date.today() + timedelta(days=begin_deltaday)), })
+        response = self.client.get(
+            path=f'/api/v1/questions/{question.pk}/',
+            HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+        create_test_response_options_via_model(question, 1)
+        # Last-Modified has seconds precision.
+        SurveyModel.objects.filter(pk=survey.pk).update(
+            updated_at=timezone.now() + timedelta(seconds=1))
+        response = self.client.get(
+            path=f'/api/v1/questions/{question.pk}/',
+            HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(len(response.data['response_options']), 1)
+
+    def test_post_questions_staff(self):
+        surveys = create_test_surveys_via_model()
+        create_test_admin()
+        self.assertTrue(
+            self.client.login(username='admin', password='admin'))
+
+        page_url = '/api/v1/surveys/'
+        while page_url:
+            response_from_surveys = self.client.get(path=page_url)
             self.assertEqual(
-                response.status_code,
-                403, response.data)
+                response_from_surveys.status_code,
+                200,
+                response_from_surveys.data)
 
+            for survey in response_from_surveys.data['results']:
+                for question_type in ['one', 'many', 'text']:
+                    response_from_questions = create_test_question_via_http(
+                        self.client,
+                        survey['url'],
+                        question_type)
 
-class QuestionViewsetTestCase(TestCase):
+                    self.assertEqual(
+                        response_from_questions.status_code,
+                        201,
+                        response_from_questions.data)
+
+            page_url = response_from_surveys.data['next']
+
+
+class QuestionTreeViewsetTestCase(SurveyTreeTestData, TestCase):
     def test_list_questions_anon(self):
-        create_test_surveys_questions_and_response_options_via_model(
-            number_of_questions=1)
         page_url = '/api/v1/questions/'
         while page_url:
             response = self.client.get(path=page_url)
@@ -171,8 +563,6 @@ class QuestionViewsetTestCase(TestCase):
             page_url = response.data['next']
 
     def test_get_questions_anon(self):
-        create_test_surveys_questions_and_response_options_via_model(
-            number_of_questions=1)
         for db_question in QuestionModel.objects.all():
             response = self.client.get(
                 path=f'/api/v1/questions/{db_question.pk}/')
@@ -188,8 +578,6 @@ class QuestionViewsetTestCase(TestCase):
                 self.assertEqual(response.status_code, 403)
 
     def test_list_questions_staff(self):
-        create_test_surveys_questions_and_response_options_via_model(
-            number_of_questions=1)
         create_test_admin()
         self.assertTrue(
             self.client.login(username='admin', password='admin'))
@@ -216,8 +604,6 @@ class QuestionViewsetTestCase(TestCase):
                 'Here is found questions that is not represented in API.')
 
     def test_get_question_staff(self):
-        create_test_surveys_questions_and_response_options_via_model(
-            number_of_questions=1)
         create_test_admin()
         self.assertTrue(
             self.client.login(username='admin', password='admin'))
@@ -232,34 +618,6 @@ class QuestionViewsetTestCase(TestCase):
                     question=db_question.pk
                 ).count())
 
-    def test_post_questions_staff(self):
-        surveys = create_test_surveys_via_model()
-        create_test_admin()
-        self.assertTrue(
-            self.client.login(username='admin', password='admin'))
-
-        page_url = '/api/v1/surveys/'
-        while page_url:
-            response_from_surveys = self.client.get(path=page_url)
-            self.assertEqual(
-                response_from_surveys.status_code,
-                200,
-                response_from_surveys.data)
-
-            for survey in response_from_surveys.data['results']:
-                for question_type in ['one', 'many', 'text']:
-                    response_from_questions = create_test_question_via_http(
-                        self.client,
-                        survey['url'],
-                        question_type)
-
-                    self.assertEqual(
-                        response_from_questions.status_code,
-                        201,
-                        response_from_questions.data)
-
-            page_url = response_from_surveys.data['next']
-
 
 class ActorViewsetTestCase(TestCase):
     def test_access_for_anon_owner(self):
@@ -326,6 +684,92 @@ class ActorViewsetTestCase(TestCase):
             self.assertEqual(response.status_code, 200)
             self.assertEqual(str(actor.pk), response.data["pk"])
 
+    def test_retrieve_actor_with_paged_sessions(self):
+        user = create_test_user(username="user", password="user")
+        actor = create_test_actors_via_model(1, user)[0]
+        sessions = create_test_sessions_via_model(actor, 12)
+        self.assertTrue(
+            self.client.login(username="user", password="user"))
+        response = self.client.get(path=f'/api/v1/actors/{actor.pk}/')
+        self.assertEqual(response.status_code, 200, response.data)
+        expected = sorted(str(session.pk) for session in sessions)
+        self.assertEqual(
+            [session['pk'] for session in response.data['sessions']],
+            expected[:10])
+
+        response = self.client.get(path=response.data['sessions_next'])
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(
+            [session['pk'] for session in response.data['results']],
+            expected[10:])
+        self.assertIsNone(response.data['next'])
+
+        self.client.logout()
+        response = self.client.get(path=f'/api/v1/actors/{actor.pk}/sessions/')
+        self.assertEqual(response.status_code, 403)
+
+
+class SessionViewsetTestCase(TestCase):
+    def test_retrieve_session_with_answers_anon(self):
+        survey = create_test_survey_via_model()
+        one, many, text = create_test_questions_via_model(survey, ("one", "many", "text"), 1)
+        response_options = [
+            *create_test_response_options_via_model(one, 2),
+            *create_test_response_options_via_model(many, 2),
+            text.response_options.get(), ]
+        session = create_test_sessions_via_model(create_test_actors_via_model(1)[0], 1)[0]
+        AnswerActModel.bulk_create_for_session(session, [
+            AnswerActModel(response=response_options[0]),
+            AnswerActModel(response=response_options[2]),
+            AnswerActModel(response=response_options[3]),
+            AnswerActModel(response=response_options[4], content='Text answer'), ])
+
+        # session with its actor, prefetched answers
+        with self.assertNumQueries(2):
+            response = self.client.get(path=f'/api/v1/sessions/{session.pk}/')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(
+            [dict(answer) for answer in response.data['answer_acts']],
+            [{'pk': answer.pk, 'question': answer.question_id,
+              'response': answer.response_id, 'content': answer.content}
+             for answer in AnswerActModel.objects.filter(session=session)])
+
+        response = self.client.post(path='/api/v1/sessions/', data={'actor': session.actor_id})
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['answer_acts'], [])
+
+
+class RowSerializerTestCase(TestCase):
+    def test_row_serializers_parity(self):
+        for begin_date, end_date in ((None, None), (date.today(), None),
+                                     (date.today() - timedelta(days=2), date.today())):
+            survey = create_test_survey_via_model(begin_date, end_date)
+            for question in create_test_questions_via_model(survey, ("one", "many"), 2):
+                create_test_response_options_via_model(question, 2)
+            create_test_questions_via_model(survey, ("text",), 1)
+        # Questions of this survey exceed the nested collection limit.
+        create_test_questions_via_model(create_test_survey_via_model(), ("text",), 12)
+        question = QuestionModel.objects.first()
+        response_option = ResponseOptionModel.objects.first()
+        paths = (
+            '/api/v1/surveys/',
+            '/api/v1/surveys/?count=false',
+            '/api/v1/questions/',
+            '/api/v1/questions/?page=2',
+            f'/api/v1/questions/{question.pk}/',
+            '/api/v1/responses/',
+            f'/api/v1/responses/{response_option.pk}/', )
+        create_test_admin()
+        for path in paths:
+            with self.subTest(path=path):
+                # Staff is served by serializers, anon by row serializers.
+                self.client.login(username='admin', password='admin')
+                expected = self.client.get(path=path)
+                self.client.logout()
+                response = self.client.get(path=path)
+                self.assertEqual(response.status_code, 200, response.content)
+                self.assertEqual(response.content, expected.content)
+
 
 class AnswerActViewsetTestCase(TestCase):
     def test_post_answer_acts_anon(self):
@@ -367,15 +811,171 @@ class AnswerActViewsetTestCase(TestCase):
 
             response_options_page_url = response_options.data['next']
 
+    def test_bulk_post_answer_acts_anon(self):
+        _, questions, _ = create_test_surveys_questions_and_response_options_via_model(
+            number_of_questions=2)
+        session = create_test_sessions_via_model(
+            create_test_actors_via_model(1)[0], 1)[0]
+        survey_questions = [
+            question for question in questions if question.survey == questions[0].survey]
+
+        answers = []
+        for question in survey_questions:
+            response_options = list(question.get_response_options())
+            if question.type != 'many':
+                response_options = response_options[:1]
+            for response_option in response_options:
+                answers.append({
+                    'response': f'http://testserver/api/v1/responses/{response_option.pk}/',
+                    'content': 'Text answer' if question.type == 'text' else None, })
+
+        response = self.client.post(
+            path='/api/v1/answers/bulk/',
+            data={
+                'session': f'http://testserver/api/v1/sessions/{session.pk}/',
+                'answers': answers, },
+            content_type='application/json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(len(response.data), len(answers))
+        self.assertEqual(
+            AnswerActModel.objects.filter(session=session).count(),
+            len(answers))
+
+    def test_post_answer_acts_with_bare_pks_anon(self):
+        survey = create_test_survey_via_model()
+        question = create_test_questions_via_model(survey, ('many',), 1)[0]
+        response_options = create_test_response_options_via_model(question, 3)
+        actor = create_test_actors_via_model(1)[0]
+
+        response = self.client.post(path='/api/v1/sessions/', data={'actor': actor.pk})
+        self.assertEqual(response.status_code, 201, response.content)
+        session_pk = response.data['pk']
+
+        response = self.client.post(
+            path='/api/v1/answers/',
+            data={'session': session_pk, 'response': response_options[0].pk})
+        self.assertEqual(response.status_code, 201, response.content)
+
+        resolve_url.cache_clear()
+        response = self.client.post(
+            path='/api/v1/answers/bulk/',
+            data={
+                'session': f'http://testserver/api/v1/sessions/{session_pk}/',
+                'answers': [
+                    {'response': response_options[1].pk},
+                    {'response': f'/api/v1/responses/{response_options[2].pk}/'}, ], },
+            content_type='application/json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(
+            AnswerActModel.objects.filter(session=session_pk).count(), 3)
+        self.assertEqual(resolve_url.cache_info().misses, 2)
+
+    def test_post_answer_act_with_invalid_hyperlinks_anon(self):
+        survey = create_test_survey_via_model()
+        question = create_test_questions_via_model(survey, ('many',), 1)[0]
+        response_option = create_test_response_options_via_model(question, 1)[0]
+        session = create_test_sessions_via_model(
+            create_test_actors_via_model(1)[0], 1)[0]
+        for response_url in (
+                'http://testserver/api/v1/unknown/1/',
+                f'http://testserver/api/v1/questions/{question.pk}/',
+                'http://testserver/api/v1/responses/',
+                'http://testserver/api/v1/responses/0/',
+                'http://testserver/api/v1/responses/x/', ):
+            with self.subTest(response=response_url):
+                response = self.client.post(
+                    path='/api/v1/answers/',
+                    data={'session': session.pk, 'response': response_url})
+                self.assertEqual(response.status_code, 400, response.content)
+                self.assertIn('response', response.data)
+
+        response = self.client.post(
+            path='/api/v1/answers/bulk/',
+            data={
+                'session': session.pk,
+                'answers': [
+                    {'response': response_option.pk},
+                    {'response': 0}, ], },
+            content_type='application/json')
+        self.assertEqual(response.status_code, 400, response.content)
+
+    def test_bulk_post_answer_acts_with_excess_anon(self):
+        survey = create_test_survey_via_model()
+        question = create_test_questions_via_model(survey, ('one',), 1)[0]
+        response_options = create_test_response_options_via_model(question, 2)
+        session = create_test_sessions_via_model(
+            create_test_actors_via_model(1)[0], 1)[0]
+
+        response = self.client.post(
+            path='/api/v1/answers/bulk/',
+            data={
+                'session': f'http://testserver/api/v1/sessions/{session.pk}/',
+                'answers': [
+                    {'response': f'http://testserver/api/v1/responses/{response_option.pk}/'}
+                    for response_option in response_options], },
+            content_type='application/json')
+        self.assertEqual(response.status_code, 400, response.content)
+        self.assertEqual(
+            AnswerActModel.objects.filter(session=session).count(), 0)
+
+    def test_get_answer_acts_with_invalid_cursor_anon(self):
+        response = self.client.get(
+            path=f'/api/v1/answers/?session={uuid.uuid4()}&cursor=invalid')
+        self.assertEqual(response.status_code, 404, response.content)
+
+
+class AnswerActTreeViewsetTestCase(SurveyTreeTestData, TestCase):
+    def test_get_answer_acts_keyset_pagination_anon(self):
+        actors, sessions, answers = create_test_actors_sessions_and_answers_via_api()
+
+        answer_pks = []
+        page_url = f'/api/v1/answers/?session={sessions[0].pk}&count=false'
+        while page_url:
+            response = self.client.get(path=page_url)
+            self.assertEqual(response.status_code, 200, response.content)
+            self.assertNotIn('count', response.data)
+            answer_pks.extend(answer['pk'] for answer in response.data['results'])
+            page_url = response.data['next']
+        self.assertEqual(answer_pks, [answer.pk for answer in answers])
+
+    def test_get_answer_acts_with_fields_and_expand_anon(self):
+        actors, sessions, answers = create_test_actors_sessions_and_answers_via_api()
+        path = f'/api/v1/answers/?session={sessions[0].pk}&count=false'
+
+        # page only: related objects are neither joined nor fetched
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path=f'{path}&expand=')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('JOIN', queries[0]['sql'])
+        answer = response.data['results'][0]
+        self.assertEqual(
+            answer['session'],
+            f'http://testserver/api/v1/sessions/{sessions[0].pk}/')
+        self.assertEqual(
+            answer['response'],
+            f'http://testserver/api/v1/responses/{answers[0].response_id}/')
+
+        response = self.client.get(path=f'{path}&expand=response')
+        answer = response.data['results'][0]
+        self.assertEqual(answer['response']['pk'], answers[0].response_id)
+        self.assertEqual(
+            answer['response']['question'],
+            f'http://testserver/api/v1/questions/{answers[0].question_id}/')
+        self.assertIsInstance(answer['session'], str)
+
+        response = self.client.get(
+            path=f'{path}&expand=response.question,session&fields=pk,response')
+        answer = response.data['results'][0]
+        self.assertEqual(list(answer), ['pk', 'response'])
+        self.assertEqual(
+            answer['response']['question']['pk'], answers[0].question_id)
+
     def test_get_answer_acts_with_empty_query_params(self):
-        create_test_surveys_questions_and_response_options_via_model(
-            number_of_questions=1)
         response = self.client.get(path=f'/api/v1/answers/')
         self.assertEqual(response.status_code, 400, response.content)
 
     def test_get_answer_acts_by_query_param_actor_anon(self):
-        create_test_surveys_questions_and_response_options_via_model(
-            number_of_questions=1)
         actors, sessions, answers = create_test_actors_sessions_and_answers_via_api()
 
         for actor in actors:
@@ -387,8 +987,6 @@ class AnswerActViewsetTestCase(TestCase):
                     answer['session']['actor']['pk'], str(actor.pk))
 
     def test_get_answer_acts_by_query_param_session_anon(self):
-        create_test_surveys_questions_and_response_options_via_model(
-            number_of_questions=1)
         actors, sessions, answers = create_test_actors_sessions_and_answers_via_api()
 
         for session in sessions:
@@ -399,8 +997,6 @@ class AnswerActViewsetTestCase(TestCase):
                 self.assertEqual(answer['session']['pk'], str(session.pk))
 
     def test_get_answer_acts_by_query_param_question_anon(self):
-        create_test_surveys_questions_and_response_options_via_model(
-            number_of_questions=1)
         actors, sessions, answers = create_test_actors_sessions_and_answers_via_api()
 
         for db_answer in answers:
@@ -411,3 +1007,149 @@ class AnswerActViewsetTestCase(TestCase):
                 self.assertEqual(
                     answer['response']['question']['pk'],
                     db_answer.response.question.pk)
+
+
+class BufferedIngestionTestCase(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.journal = os.path.join(self.directory, 'journal.sqlite3')
+        self.settings = override_settings(ANSWER_INGESTION={
+            'MODE': 'buffered',
+            'JOURNAL': self.journal,
+            'BATCH_SIZE': 3,
+            'FLUSH_INTERVAL': None, })
+        self.settings.enable()
+
+        survey = create_test_survey_via_model()
+        self.question = create_test_questions_via_model(survey, ('one',), 1)[0]
+        self.response_options = create_test_response_options_via_model(self.question, 2)
+        self.session = create_test_sessions_via_model(
+            create_test_actors_via_model(1)[0], 1)[0]
+
+    def tearDown(self):
+        buffer = ingestion.buffers.pop(self.journal, None)
+        if buffer is not None:
+            buffer.close()
+        self.settings.disable()
+        shutil.rmtree(self.directory)
+
+    def post_bulk(self, response_options):
+        return self.client.post(
+            path='/api/v1/answers/bulk/',
+            data={
+                'session': self.session.pk,
+                'answers': [
+                    {'response': response_option.pk}
+                    for response_option in response_options], },
+            content_type='application/json')
+
+    def test_post_answer_act_is_accepted_and_flushed(self):
+        response = self.client.post(
+            path='/api/v1/answers/',
+            data={'session': self.session.pk, 'response': self.response_options[0].pk})
+        self.assertEqual(response.status_code, 202, response.content)
+        self.assertEqual(response.data, {'accepted': 1})
+        self.assertFalse(AnswerActModel.objects.exists())
+
+        self.assertEqual(ingestion.get_buffer().flush(), (1, 0))
+        self.assertEqual(
+            AnswerActModel.objects.get(session=self.session).response_id,
+            self.response_options[0].pk)
+
+    def test_excess_answers_are_rejected_on_flush(self):
+        response = self.post_bulk(self.response_options)
+        self.assertEqual(response.status_code, 202, response.content)
+        self.assertEqual(response.data, {'accepted': 2})
+
+        buffer = ingestion.get_buffer()
+        self.assertEqual(buffer.flush(), (1, 1))
+        self.assertEqual(AnswerActModel.objects.filter(session=self.session).count(), 1)
+        self.assertEqual(buffer.count(), 0)
+        self.assertEqual(buffer.count(ingestion.REJECTED), 1)
+
+    def test_answers_inserted_by_crashed_flush_are_not_rejected(self):
+        response = self.post_bulk(self.response_options[:1])
+        self.assertEqual(response.status_code, 202, response.content)
+        # A flush inserts the answer and crashes before updating the journal.
+        AnswerActModel(session=self.session, response=self.response_options[0]).save()
+
+        buffer = ingestion.get_buffer()
+        self.assertEqual(buffer.flush(), (1, 0))
+        self.assertEqual(AnswerActModel.objects.filter(session=self.session).count(), 1)
+        self.assertEqual(buffer.count(ingestion.REJECTED), 0)
+
+    def test_batch_is_flushed_by_size(self):
+        question = create_test_questions_via_model(
+            self.question.survey, ('many',), 1)[0]
+        response_options = create_test_response_options_via_model(question, 3)
+        self.assertEqual(self.post_bulk(response_options[:2]).status_code, 202)
+        self.assertFalse(AnswerActModel.objects.exists())
+        self.assertEqual(self.post_bulk(response_options[2:]).status_code, 202)
+        self.assertEqual(AnswerActModel.objects.filter(session=self.session).count(), 3)
+
+    def test_journal_survives_restart(self):
+        self.assertEqual(self.post_bulk(self.response_options[:1]).status_code, 202)
+        # The process dies without flushing.
+        ingestion.buffers.pop(self.journal).journal.close()
+
+        call_command('flush_answers', stdout=StringIO())
+        self.assertEqual(AnswerActModel.objects.filter(session=self.session).count(), 1)
+
+
+class AsyncIngestionTestCase(TransactionTestCase):
+    def setUp(self):
+        survey = create_test_survey_via_model()
+        question = create_test_questions_via_model(survey, ('many',), 1)[0]
+        self.response_options = create_test_response_options_via_model(question, 2)
+        self.actor = create_test_actors_via_model(1)[0]
+
+    async def test_post_session_and_answers_anon(self):
+        response = await self.async_client.post(
+            '/api/v1/async/sessions/', {'actor': self.actor.pk},
+            content_type='application/json')
+        self.assertEqual(response.status_code, 201, response.content)
+        session_pk = json.loads(response.content)['pk']
+
+        response = await self.async_client.post(
+            '/api/v1/async/answers/',
+            {'session': session_pk, 'response': self.response_options[0].pk},
+            content_type='application/json')
+        self.assertEqual(response.status_code, 201, response.content)
+
+        response = await self.async_client.post(
+            '/api/v1/async/answers/bulk/',
+            {'session': session_pk, 'answers': [{'response': self.response_options[1].pk}]},
+            content_type='application/json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(
+            await sync_to_async(AnswerActModel.objects.filter(session=session_pk).count)(), 2)
+
+    async def test_post_answer_with_invalid_session_anon(self):
+        response = await self.async_client.post(
+            '/api/v1/async/answers/',
+            {'session': str(uuid.uuid4()), 'response': self.response_options[0].pk},
+            content_type='application/json')
+        self.assertEqual(response.status_code, 400, response.content)
+        self.assertIn('session', json.loads(response.content))
+
+    @override_settings(DEBUG=True)
+    async def test_queries_of_offloaded_views_counted_anon(self):
+        response = await self.async_client.post(
+            '/api/v1/async/sessions/', {'actor': self.actor.pk},
+            content_type='application/json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertGreater(int(response['X-DB-Queries']), 0)
+
+
+class LoadTestCommandTestCase(LiveServerTestCase):
+    def test_load_sync_and_async_endpoints(self):
+        for mode in ('sync', 'async'):
+            with self.subTest(mode=mode):
+                out = StringIO()
+                call_command(
+                    'loadtest', self.live_server_url, '--mode', mode,
+                    '--concurrency', '1,2', '--duration', '0.2', stdout=out)
+                lines = out.getvalue().splitlines()
+                self.assertEqual(len(lines), 3, out.getvalue())
+                self.assertIn(' 0 errors', lines[0])
+                self.assertIn('Load test finished.', lines[2])
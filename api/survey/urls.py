@@ -3,6 +3,7 @@ from django.urls import path
 
 from rest_framework.routers import DefaultRouter
 
+from . import async_views
 from .viewsets import *
 
 router: DefaultRouter = DefaultRouter()
@@ -15,5 +16,8 @@ router.register(r"sessions", SessionViewset)
 router.register(r"answers", AnswerActViewset)
 
 urlpatterns = [
+    path("async/sessions/", async_views.session_create, name="async-session-create"),
+    path("async/answers/", async_views.answer_create, name="async-answer-create"),
+    path("async/answers/bulk/", async_views.answer_bulk, name="async-answer-bulk"),
     path("", include(router.urls)),
 ]
@@ -0,0 +1,38 @@
+import secrets
+import threading
+import time
+import uuid
+
+from django.conf import settings
+
+_lock = threading.Lock()
+_last_timestamp = 0
+_counter = 0
+
+
+def uuid7() -> uuid.UUID:
+    """Time-ordered UUID of version 7 (RFC 9562): 48 bits of Unix time in
+    milliseconds, 12 bits of a counter and 62 random bits. Keys generated by
+    the process are monotonic, the counter is seeded randomly every
+    millisecond and borrows the next millisecond when it overflows."""
+    global _last_timestamp, _counter
+    with _lock:
+        timestamp = time.time_ns() // 1_000_000
+        if timestamp > _last_timestamp:
+            _last_timestamp, _counter = timestamp, secrets.randbits(11)
+        else:
+            _counter += 1
+            if _counter > 0xFFF:
+                _last_timestamp, _counter = _last_timestamp + 1, secrets.randbits(11)
+        timestamp, counter = _last_timestamp, _counter
+    return uuid.UUID(int=(
+        timestamp << 80 | 0x7 << 76 | counter << 64 | 0b10 << 62 | secrets.randbits(62)))
+
+
+generators = {4: uuid.uuid4, 7: uuid7}
+
+
+def generate_unique_key() -> uuid.UUID:
+    """Default of primary keys of actors and sessions, the UUID version is
+    chosen by ``SURVEY_UNIQUE_KEY_VERSION`` setting."""
+    return generators[getattr(settings, 'SURVEY_UNIQUE_KEY_VERSION', 4)]()
@@ -0,0 +1,109 @@
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Tuple
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+
+logger = logging.getLogger(__name__)
+
+
+class QueryStats:
+    """Counts SQL queries and the time spent in them while recording."""
+
+    def __init__(self) -> None:
+        self.queries: int = 0
+        self.db_time: float = 0.0
+
+    def add(self, db_time: float) -> None:
+        self.queries += 1
+        self.db_time += db_time
+
+    @contextmanager
+    def record(self):
+        for connection in connections.all():
+            install_query_counter(connection=connection)
+        # Recordings nest, e.g. tests record requests which the middleware
+        # records too, and every one of them counts the queries.
+        token = recording_stats.set(recording_stats.get() + (self,))
+        try:
+            yield self
+        finally:
+            recording_stats.reset(token)
+
+
+# Connections are thread-local while a request may run its queries in other
+# threads (sync views under ASGI, offloaded async views). asgiref copies the
+# context into those threads, so the stats being recorded travel with it.
+recording_stats: ContextVar[Tuple[QueryStats, ...]] = ContextVar(
+    'recording_stats', default=())
+
+
+def count_query(execute, sql, params, many, context):
+    recordings = recording_stats.get()
+    if not recordings:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        db_time = time.perf_counter() - start
+        for stats in recordings:
+            stats.add(db_time)
+
+
+def install_query_counter(connection, **kwargs) -> None:
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
+
+
+connection_created.connect(install_query_counter)
+
+
+class QueryStatsMiddleware:
+    """Measures query count, DB time and serialization time (time spent
+    outside the database) of every request.
+
+    Stats are exposed as ``X-DB-*`` response headers when ``DEBUG`` is on
+    and logged otherwise. Queries are counted in whichever thread runs
+    them, so under ASGI those of sync and offloaded async views count too."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response) -> None:
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        start = time.perf_counter()
+        with QueryStats().record() as stats:
+            response = self.get_response(request)
+        return self.report(request, response, stats, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        with QueryStats().record() as stats:
+            response = await self.get_response(request)
+        return self.report(request, response, stats, time.perf_counter() - start)
+
+    def report(self, request, response, stats: QueryStats, total_time: float):
+        serialization_time = total_time - stats.db_time
+
+        if settings.DEBUG:
+            response['X-DB-Queries'] = str(stats.queries)
+            response['X-DB-Time'] = f'{stats.db_time * 1000:.2f}'
+            response['X-Serialization-Time'] = f'{serialization_time * 1000:.2f}'
+        else:
+            logger.info(
+                '%s %s %s queries=%d db=%.2fms serialization=%.2fms',
+                request.method, request.get_full_path(), response.status_code,
+                stats.queries, stats.db_time * 1000, serialization_time * 1000)
+        return response
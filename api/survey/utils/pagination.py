@@ -0,0 +1,143 @@
+import json
+from base64 import b64decode, b64encode
+from binascii import Error as BinasciiError
+from collections import OrderedDict
+from datetime import date
+from typing import Any, List, Optional, Tuple
+
+from django.db.models import F, OuterRef, Q, Subquery
+from django.db.models.query import QuerySet
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination keyed on values of ``ordering`` fields.
+
+    Pages are fetched with a ``WHERE (ordering) > (cursor)`` filter instead of
+    OFFSET, so every page costs the same. The last ordering field must be
+    unique. NULLs are ordered first. Total count can be skipped with
+    ``?count=false``."""
+    ordering: Tuple[str, ...] = ('pk',)
+    page_size: int = api_settings.PAGE_SIZE
+    cursor_query_param: str = 'cursor'
+    count_query_param: str = 'count'
+    invalid_cursor_message: str = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset: QuerySet, request, view=None) -> List:
+        self.request = request
+        self.position, self.reverse = self.decode_cursor(request)
+
+        self.count = None
+        if request.query_params.get(self.count_query_param, 'true').lower() != 'false':
+            self.count = queryset.count()
+
+        if self.position is not None:
+            queryset = queryset.filter(
+                self.get_position_filter(self.position, self.reverse))
+        if self.reverse:
+            order_by = [F(field).desc(nulls_last=True) for field in self.ordering]
+        else:
+            order_by = [F(field).asc(nulls_first=True) for field in self.ordering]
+
+        results = list(queryset.order_by(*order_by)[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if self.reverse:
+            results.reverse()
+            self.has_next, self.has_previous = self.position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.position is not None
+
+        self.page = results
+        return results
+
+    def get_paginated_response(self, data) -> Response:
+        response_data = OrderedDict()
+        if self.count is not None:
+            response_data['count'] = self.count
+        response_data['next'] = self.get_next_link()
+        response_data['previous'] = self.get_previous_link()
+        response_data['results'] = data
+        return Response(response_data)
+
+    def get_next_link(self) -> Optional[str]:
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.get_position(self.page[-1]), reverse=False)
+
+    def get_previous_link(self) -> Optional[str]:
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.get_position(self.page[0]), reverse=True)
+
+    def get_position(self, item) -> List[Any]:
+        """Reads ordering fields of a model instance or of a ``.values()`` row."""
+        position = []
+        for field in self.ordering:
+            value = item[field] if isinstance(item, dict) else getattr(item, field)
+            if isinstance(value, date):
+                value = value.isoformat()
+            elif value is not None and not isinstance(value, (int, str)):
+                value = str(value)
+            position.append(value)
+        return position
+
+    def get_position_filter(self, position: List[Any], reverse: bool) -> Q:
+        """Builds lexicographic ``(ordering) > position`` (or ``<`` when
+        ``reverse``) condition, where NULL is less than any value."""
+        position_filter = Q(pk__in=[])
+        preceding_equal = Q()
+        for field, value in zip(self.ordering, position):
+            if value is None:
+                beyond = Q(pk__in=[]) if reverse else Q(**{f'{field}__isnull': False})
+                equal = Q(**{f'{field}__isnull': True})
+            elif reverse:
+                beyond = Q(**{f'{field}__lt': value}) | Q(**{f'{field}__isnull': True})
+                equal = Q(**{field: value})
+            else:
+                beyond = Q(**{f'{field}__gt': value})
+                equal = Q(**{field: value})
+            position_filter |= preceding_equal & beyond
+            preceding_equal &= equal
+        return position_filter
+
+    def decode_cursor(self, request) -> Tuple[Optional[List[Any]], bool]:
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+        try:
+            cursor = json.loads(b64decode(encoded.encode('ascii')).decode('utf-8'))
+            position, reverse = cursor['p'], bool(cursor['r'])
+        except (BinasciiError, UnicodeError, ValueError, TypeError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def encode_cursor(self, position: List[Any], reverse: bool, url: Optional[str] = None) -> str:
+        """Link to the page of ``url``, the requested one by default, which
+        follows (or precedes when ``reverse``) ``position``."""
+        encoded = b64encode(json.dumps(
+            {'p': position, 'r': int(reverse)}, separators=(',', ':')).encode('utf-8'))
+        return replace_query_param(
+            url or self.request.build_absolute_uri(),
+            self.cursor_query_param, encoded.decode('ascii'))
+
+
+def limit_per_parent(queryset: QuerySet, parent_field: str, limit: int) -> QuerySet:
+    """Filters ``queryset`` to the first ``limit`` rows by pk of every parent,
+    so prefetches of capped nested collections stay bounded. Rows before the
+    ``limit + 1``-th sibling are kept, its pk is looked up by a correlated
+    subquery for every row. The model must have a ``(parent_field, pk)``
+    index, so the subquery skips ``limit`` index entries instead of sorting
+    all siblings."""
+    cutoff = queryset.model._default_manager.filter(
+        **{parent_field: OuterRef(parent_field)},
+    ).order_by('pk').values('pk')[limit:limit + 1]
+    return queryset.annotate(sibling_cutoff=Subquery(cutoff)).filter(
+        Q(sibling_cutoff__isnull=True) | Q(pk__lt=F('sibling_cutoff')))
@@ -10,10 +10,18 @@ class DontShowUnpublished(BasePermission):
     def has_object_permission(self, request, view, obj):
         return obj.is_published
 
+    def filter_queryset(self, request, view, queryset):
+        return queryset.published()
+
 
 class DontShowUnpublishedForNonStaff(BasePermission):
     def has_object_permission(self, request, view, obj):
-        return obj.is_published or request.user.is_staff
+        return request.user.is_staff or obj.is_published
+
+    def filter_queryset(self, request, view, queryset):
+        if request.user.is_staff:
+            return queryset
+        return queryset.published()
 
 
 class DontShowFakeAnswer(BasePermission):
@@ -28,4 +36,4 @@ class IsOwnerOrAdmin(BasePermission):
         else:
             return obj.user == request.user or \
                 request.user.is_superuser or \
-                request.user.is_staff
\ No newline at end of file
+                request.user.is_staff
@@ -1,23 +1,112 @@
+from functools import lru_cache
+from typing import Any, Tuple
+from urllib.parse import urlparse
+
+from django.core.exceptions import ValidationError
 from django.urls.base import resolve
+from django.urls.exceptions import Resolver404
 
 from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
+from rest_framework.reverse import reverse
+from rest_framework.utils.field_mapping import get_detail_view_name
+
+from .serializers import get_field_path, get_subexpand
+
+
+@lru_cache(maxsize=8192)
+def resolve_url(url: str) -> Tuple[str, Any]:
+    """Function provide view name and pk of object which is referenced by hyperlink. Results are memoized.
+    Pk is None for hyperlinks of routes without it, e.g. lists."""
+    match = resolve(urlparse(url).path)
+    return match.view_name, match.kwargs.get('pk')
+
+
+def is_bare_pk(data) -> bool:
+    return isinstance(data, int) or (isinstance(data, str) and '/' not in data)
+
+
+class ModelRelaitedManyField(serializers.ManyRelatedField):
+    """Many related field which fetches all referenced objects in one query."""
+
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+
+        pks = [self.child_relation.get_pk(item) for item in data]
+        try:
+            objects = self.child_relation.get_queryset().in_bulk(pks)
+        except (TypeError, ValueError, ValidationError):
+            self.child_relation.fail('does_not_exist')
+        try:
+            return [objects[self.child_relation.to_pk(pk)] for pk in pks]
+        except (KeyError, TypeError, ValueError, ValidationError):
+            self.child_relation.fail('does_not_exist')
 
 
 class ModelRelaitedField(serializers.RelatedField):
+    """Related field which accepts hyperlink or bare pk and represents
+    related object with ``serializer_class`` or, when it isn't
+    ``expanded``, with hyperlink."""
+    default_error_messages = {
+        'does_not_exist': 'Invalid hyperlink - Object does not exist.',
+        'incorrect_type': 'Incorrect type. Expected URL string or pk, received {data_type}.',
+        'no_match': 'Invalid hyperlink - No URL match.',
+        'incorrect_match': 'Invalid hyperlink - Incorrect URL match.',
+    }
+
     def __init__(self, serializer_class, **kwargs):
         self.serializer_class: serializers.Serializer = serializer_class
         assert self.serializer_class != None, "Serializer wasn't provided."
         assert not isinstance(
             self.serializer_class, serializers.Serializer), "Provided class isn't Serializer."
+        self.expanded: bool = True
         super().__init__(**kwargs)
 
+    def use_pk_only_optimization(self) -> bool:
+        return not self.expanded
+
     def to_representation(self, value):
-        return self.serializer_class(value, context={'request': self.context["request"]}).data
+        request = self.context["request"]
+        if not self.expanded:
+            return reverse(
+                get_detail_view_name(self.serializer_class.Meta.model),
+                kwargs={'pk': value.pk}, request=request)
+        context = {
+            'request': request,
+            'expand': get_subexpand(self.context.get('expand'), get_field_path(self)), }
+        return self.serializer_class(value, context=context).data
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return ModelRelaitedManyField(**list_kwargs)
+
+    def get_pk(self, data):
+        if is_bare_pk(data):
+            return data
+        if not isinstance(data, str):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            view_name, pk = resolve_url(data)
+        except Resolver404:
+            self.fail('no_match')
+        if pk is None or view_name != get_detail_view_name(self.get_queryset().model):
+            self.fail('incorrect_match')
+        return pk
+
+    def to_pk(self, pk):
+        """Converts pk to the python type of the model pk, as ``in_bulk`` keys it."""
+        return self.get_queryset().model._meta.pk.to_python(pk)
 
     def to_internal_value(self, data):
-        assert isinstance(data, str), f"Unsupported data type (type: {type(data)})"
-        def strip_domain_url(absolute_url: str) -> str:
-            """Function provide domain striped url. It's based on that domain always placed between 2'th and 3'th '/' letters."""
-            return absolute_url.split(absolute_url.split('/')[2])[1]
-        resolved_data = resolve(strip_domain_url(data))
-        return self.get_queryset().get(pk=resolved_data.kwargs["pk"])
+        queryset = self.get_queryset()
+        try:
+            return queryset.get(pk=self.get_pk(data))
+        except (queryset.model.DoesNotExist, TypeError, ValueError, ValidationError):
+            self.fail('does_not_exist')
@@ -0,0 +1,122 @@
+from collections import OrderedDict
+from typing import Iterable, Optional, Set, Tuple
+
+from django.db import models
+from rest_framework import serializers
+from rest_framework.reverse import reverse
+from rest_framework.utils.field_mapping import get_detail_view_name
+
+from .pagination import KeysetPagination
+
+
+def get_field_path(field: serializers.Field) -> Tuple[str, ...]:
+    """Function provide names of fields which lead from the root serializer to the bound ``field``."""
+    names = []
+    while field.parent is not None:
+        if field.field_name:
+            names.append(field.field_name)
+        field = field.parent
+    return tuple(reversed(names))
+
+
+def parse_expand(value: Optional[str]) -> Optional[Set[str]]:
+    """Function provide set of dotted paths of ``expand`` query param, including paths of their parents."""
+    if value is None:
+        return None
+    expand = set()
+    for path in filter(None, (path.strip() for path in value.split(','))):
+        names = path.split('.')
+        expand.update('.'.join(names[:i]) for i in range(1, len(names) + 1))
+    return expand
+
+
+def parse_fields(value: Optional[str]) -> Optional[Set[str]]:
+    if value is None:
+        return None
+    return set(filter(None, (name.strip() for name in value.split(','))))
+
+
+def get_subexpand(expand: Optional[Set[str]], path: Iterable[str]) -> Optional[Set[str]]:
+    """Function provide paths of ``expand`` relative to the field at ``path``."""
+    if expand is None:
+        return None
+    prefix = '.'.join(path) + '.'
+    return {name[len(prefix):] for name in expand if name.startswith(prefix)}
+
+
+class ExpandableFieldsMixin:
+    """Serializer which keeps only ``fields`` of the context and represents
+    nested relations not listed in ``expand`` of the context as hyperlinks.
+
+    ``fields`` applies to the root serializer only. ``expand`` is a set of
+    dotted paths from the root serializer. ``None`` means all fields and all
+    expanded relations."""
+
+    def get_fields(self):
+        fields = super().get_fields()
+        path = get_field_path(self)
+
+        requested = self.context.get('fields') if not path else None
+        if requested is not None:
+            fields = OrderedDict(
+                (name, field) for name, field in fields.items() if name in requested)
+
+        expand = self.context.get('expand')
+        if expand is not None:
+            for name, field in fields.items():
+                if '.'.join((*path, name)) not in expand:
+                    fields[name] = self.collapse_field(field)
+        return fields
+
+    def collapse_field(self, field: serializers.Field) -> serializers.Field:
+        if hasattr(field, 'expanded'):
+            field.expanded = False
+            return field
+        nested = field.child if isinstance(field, serializers.ListSerializer) else field
+        if not isinstance(nested, serializers.ModelSerializer):
+            return field
+        view_name = get_detail_view_name(nested.Meta.model)
+        if isinstance(field, CappedListSerializer):
+            return CappedListSerializer(
+                child=serializers.HyperlinkedRelatedField(view_name=view_name, read_only=True),
+                limit=field.limit, source=field.source, read_only=True)
+        return serializers.HyperlinkedRelatedField(
+            view_name=view_name, source=field.source,
+            many=nested is not field, read_only=True)
+
+
+class CappedListSerializer(serializers.ListSerializer):
+    """Nested collection which represents its first ``limit`` items only, the
+    rest is paged by the sub-resource linked by ``NestedNextLinkField``."""
+
+    def __init__(self, *args, limit: int, **kwargs) -> None:
+        self.limit = limit
+        super().__init__(*args, **kwargs)
+
+    def to_representation(self, data):
+        # Slices of prefetched managers are taken from the prefetched rows.
+        items = data.all() if isinstance(data, models.Manager) else data
+        return [self.child.to_representation(item) for item in items[:self.limit]]
+
+
+class NestedNextLinkField(serializers.Field):
+    """Link to the page of ``view_name`` sub-resource which follows items of
+    ``collection`` capped at ``limit``, ``None`` when all of them fit."""
+
+    def __init__(self, collection: str, view_name: str, limit: int, **kwargs) -> None:
+        self.collection = collection
+        self.view_name = view_name
+        self.limit = limit
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance) -> Optional[str]:
+        items = list(getattr(instance, self.collection).all()[:self.limit + 1])
+        if len(items) <= self.limit:
+            return None
+        pagination = KeysetPagination()
+        url = reverse(
+            self.view_name, kwargs={'pk': instance.pk}, request=self.context.get('request'))
+        return pagination.encode_cursor(
+            pagination.get_position(items[self.limit - 1]), reverse=False, url=url)
@@ -0,0 +1,18 @@
+import csv
+from typing import Iterable, Iterator
+
+
+class Echo:
+    """Pseudo-buffer which returns written value instead of storing it."""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def stream_csv(header: Iterable, rows: Iterable[Iterable]) -> Iterator[str]:
+    """Yields CSV lines of ``header`` and ``rows`` one by one, so they can be
+    passed to ``StreamingHttpResponse`` without buffering."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
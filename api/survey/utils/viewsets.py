@@ -1,7 +1,90 @@
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Set, Tuple, Union
+
+from django.db.models import Prefetch
+from django.db.models.query import QuerySet
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
 from rest_framework.viewsets import (mixins, GenericViewSet,)
 from rest_framework.request import Request
 from rest_framework.response import Response
 
+from .pagination import KeysetPagination
+from .serializers import parse_expand, parse_fields
+
+
+class QueryPlanMixin:
+    """Applies the ``select_related``/``prefetch_related`` plan declared on
+    a viewset, so nested serializers don't query per object.
+
+    Representation can be narrowed with ``?fields=`` (top level fields) and
+    ``?expand=`` (dotted paths of nested relations, the others are rendered
+    as hyperlinks). ``expandable_select_related`` lookups are cut to the
+    expanded relations, and prefetches of omitted fields are skipped unless
+    ``prefetching_fields`` (field name to the field which prefetch it reads,
+    e.g. links to the rest of capped collections) are requested."""
+    select_related: Tuple[str, ...] = ()
+    expandable_select_related: Tuple[str, ...] = ()
+    prefetch_related: Tuple[Union[str, Prefetch], ...] = ()
+    prefetching_fields: Dict[str, str] = {}
+    fields_query_param: str = 'fields'
+    expand_query_param: str = 'expand'
+
+    def get_requested_fields(self) -> Optional[Set[str]]:
+        return parse_fields(self.request.query_params.get(self.fields_query_param))
+
+    def get_expand(self) -> Optional[Set[str]]:
+        return parse_expand(self.request.query_params.get(self.expand_query_param))
+
+    def is_default_representation(self) -> bool:
+        return (self.fields_query_param not in self.request.query_params
+                and self.expand_query_param not in self.request.query_params)
+
+    def get_serializer_context(self) -> dict:
+        context = super().get_serializer_context()
+        context['fields'] = self.get_requested_fields()
+        context['expand'] = self.get_expand()
+        return context
+
+    def get_select_related(self) -> Tuple[str, ...]:
+        fields, expand = self.get_requested_fields(), self.get_expand()
+        lookups = list(self.select_related)
+        for lookup in self.expandable_select_related:
+            names = lookup.split('__')
+            if fields is not None and names[0] not in fields:
+                continue
+            if expand is not None:
+                depth = 0
+                while depth < len(names) and '.'.join(names[:depth + 1]) in expand:
+                    depth += 1
+                names = names[:depth]
+            if names:
+                lookups.append('__'.join(names))
+        return tuple(lookups)
+
+    def get_prefetch_related(self) -> Tuple[Union[str, Prefetch], ...]:
+        fields = self.get_requested_fields()
+        if fields is not None:
+            fields = fields | {
+                self.prefetching_fields[name]
+                for name in fields if name in self.prefetching_fields}
+        return tuple(
+            lookup for lookup in self.prefetch_related
+            if fields is None
+            or getattr(lookup, 'prefetch_through', lookup).split('__')[0] in fields)
+
+    def get_queryset(self) -> QuerySet:
+        queryset = super().get_queryset()
+        select_related = self.get_select_related()
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        prefetch_related = self.get_prefetch_related()
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        return queryset
+
 
 class PermissedRetrieveModelMixin(mixins.RetrieveModelMixin):
     def retrieve(self, request, *args, **kwargs):
@@ -11,38 +94,108 @@ class PermissedRetrieveModelMixin(mixins.RetrieveModelMixin):
         return Response(serializer.data)
 
 
+class ConditionalRetrieveMixin:
+    """Retrieve which sets ``ETag`` and ``Last-Modified`` of the object and
+    answers ``If-None-Match``/``If-Modified-Since`` with 304 before fetching
+    and serializing the object.
+
+    ``get_validators(instance)`` returns ``(etag, last_modified)`` of the
+    fetched object, ``get_validators()`` has to look them up without fetching
+    it. ``None`` means they are unknown and the object is served in full."""
+    conditional_headers = {'HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE'}
+
+    def get_validators(self, instance=None) -> Optional[Tuple[str, datetime]]:
+        return None
+
+    def get_object(self):
+        instance = super().get_object()
+        self.validators = self.get_validators(instance)
+        return instance
+
+    def retrieve(self, request, *args, **kwargs):
+        self.validators = None
+        if self.conditional_headers & request.META.keys():
+            self.validators = self.get_validators()
+            if self.validators is not None:
+                etag, last_modified = self.validators
+                response = get_conditional_response(
+                    request, etag=etag, last_modified=int(last_modified.timestamp()))
+                if response is not None:
+                    return self.set_validators(response)
+        response = self.retrieve_unconditionally(request, *args, **kwargs)
+        if response.status_code == 200:
+            self.set_validators(response)
+        return response
+
+    def retrieve_unconditionally(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    def set_validators(self, response: HttpResponse) -> HttpResponse:
+        if self.validators is not None:
+            etag, last_modified = self.validators
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified.timestamp())
+        return response
+
+
 class PermissedListModelMixin(mixins.ListModelMixin):
-    def __filter_via_object_permitions(self, request: Request, objs: list) -> list:
-        unwanteds = []
-        for obj in objs:
-            for permission in self.get_permissions():
-                if not permission.has_object_permission(request, self, obj):
-                    unwanteds.append(obj)
-        for unwanted in unwanteds:
-            objs.remove(unwanted)
+    """List which hides objects rejected by object permissions.
+
+    Permissions providing ``filter_queryset(request, view, queryset)`` narrow
+    the queryset in SQL before pagination. The others are still checked
+    per object, but only against the fetched page."""
+
+    def __filter_via_queryset_permissions(self, request: Request, queryset: QuerySet) -> QuerySet:
+        for permission in self.get_permissions():
+            if hasattr(permission, "filter_queryset"):
+                queryset = permission.filter_queryset(request, self, queryset)
+        return queryset
 
-        return objs
+    def __filter_via_object_permitions(self, request: Request, objs: Iterable) -> list:
+        permissions = [
+            permission for permission in self.get_permissions()
+            if not hasattr(permission, "filter_queryset")]
+        return [
+            obj for obj in objs
+            if all(permission.has_object_permission(request, self, obj)
+                   for permission in permissions)]
 
     def list(self, request, *args, **kwargs):
-        queryset = self.filter_queryset(self.get_queryset())
-        candidates = [query for query in queryset]
-        filtereds = self.__filter_via_object_permitions(request, candidates)
-        page = self.paginate_queryset(filtereds)
+        queryset = self.__filter_via_queryset_permissions(
+            request, self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
         if page is not None:
-            serializer = self.get_serializer(page, many=True)
+            filtereds = self.__filter_via_object_permitions(request, page)
+            serializer = self.get_serializer(filtereds, many=True)
             return self.get_paginated_response(serializer.data)
         else:
-            serializer = self.get_serializer(queryset, many=True)
+            filtereds = self.__filter_via_object_permitions(request, queryset)
+            serializer = self.get_serializer(filtereds, many=True)
             return Response(serializer.data)
 
 
-class ReadOnlyPermissedModelViewset(PermissedRetrieveModelMixin,
+class NestedPageMixin:
+    """Pages related collections of objects, e.g. the ones their details cap,
+    with ``nested_pagination_class``."""
+    nested_pagination_class = KeysetPagination
+
+    def get_nested_page(self, queryset: QuerySet, serializer_class) -> Response:
+        paginator = self.nested_pagination_class()
+        page = paginator.paginate_queryset(queryset, self.request, view=self)
+        serializer = serializer_class(
+            page, many=True, context=self.get_serializer_context())
+        return paginator.get_paginated_response(serializer.data)
+
+
+class ReadOnlyPermissedModelViewset(QueryPlanMixin,
+                                    PermissedRetrieveModelMixin,
                                     PermissedListModelMixin,
                                     GenericViewSet):
     pass
 
 
-class PermissedModelViewset(mixins.CreateModelMixin,
+class PermissedModelViewset(QueryPlanMixin,
+                            mixins.CreateModelMixin,
                             PermissedRetrieveModelMixin,
                             mixins.UpdateModelMixin,
                             mixins.DestroyModelMixin,
@@ -1,41 +1,249 @@
+from datetime import datetime
+from typing import Optional, Tuple
+
 from django.http.response import HttpResponse
 from django.http.response import HttpResponseBadRequest
+from django.http.response import StreamingHttpResponse
+from django.db import transaction
+from django.db.models import Prefetch
 from django.db.models.query import QuerySet
 
-from rest_framework import mixins
+from rest_framework import mixins, status
+from rest_framework.decorators import action
+from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import (AllowAny, IsAdminUser,)
+from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet
 
+from . import documents, ingestion
 from .utils.exceptions import (
-    EmptyQueryParamsException, WrongQueryParamsException,)
+    EmptyQueryParamsException, NumberExcess, WrongQueryParamsException,)
 from .utils.permissions import (
     AllowListAndRetrieve, DontShowUnpublishedForNonStaff, IsOwnerOrAdmin)
+from .utils.pagination import KeysetPagination, limit_per_parent
+from .utils.streaming import stream_csv
 from .utils.viewsets import (
-    PermissedModelViewset, PermissedRetrieveModelMixin,)
+    ConditionalRetrieveMixin, NestedPageMixin, PermissedModelViewset,
+    PermissedRetrieveModelMixin, QueryPlanMixin,)
 from .models import (
     SurveyModel, QuestionModel, ResponseOptionModel,
-    ActorModel, SessionModel, AnswerActModel,)
+    ActorModel, SessionModel, AnswerActModel, ActiveSurveyModel,)
 from .serializers import (
     SurveyDetailSerializer, QuestionDetailSerializer, ResponseOptionDetailSerializer,
-    ActorDetailSerializer, SessionDetailSerializer, AnswerActDetailSerializer,)
+    ActorDetailSerializer, SessionDetailSerializer, AnswerActDetailSerializer,
+    AnswerActBulkSerializer, SurveyDetailRowSerializer, QuestionDetailRowSerializer,
+    ResponseOptionDetailRowSerializer, SurveyDocumentSerializer, SessionShortSerializer,
+    QuestionShortSerializer, NESTED_COLLECTION_LIMIT,)
+
+
+# ---------- SURVEY READ PATH ----------
+
+
+class SurveyVersionConditionMixin(ConditionalRetrieveMixin):
+    """Validators of surveys, questions and response options derived from
+    the version of their survey. ``survey_lookup`` of the queryset leads from
+    the object to the survey."""
+    survey_state_fields = ("pk", "version", "updated_at", "begin_date", "end_date")
+
+    def get_validators(self, instance=None) -> Optional[Tuple[str, datetime]]:
+        if instance is None:
+            row = self.get_survey_row()
+            if row is None:
+                return None
+            state = row["survey_state"]
+            if not (self.request.user.is_staff
+                    or state["pk"] in ActiveSurveyModel.get_ids()):
+                # Let the full retrieve deny access.
+                return None
+        else:
+            survey = instance
+            for name in filter(None, self.queryset.survey_lookup.split("__")):
+                survey = getattr(survey, name)
+            state = {
+                field: getattr(survey, field) for field in self.survey_state_fields}
+        return self.get_survey_validators(state)
+
+    def get_survey_row(self, *values) -> Optional[dict]:
+        """Looks up ``values`` of the object along with the state of its
+        survey, which is put under ``survey_state`` key."""
+        lookup = self.queryset.survey_lookup
+        prefix = f"{lookup}__" if lookup else ""
+        survey_values = {prefix + field: field for field in self.survey_state_fields}
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            row = self.queryset.filter(
+                **{self.lookup_field: self.kwargs[lookup_url_kwarg]},
+            ).values(*dict.fromkeys((*values, *survey_values))).first()
+        except (TypeError, ValueError):
+            return None
+        if row is not None:
+            row["survey_state"] = {
+                field: row[value] for value, field in survey_values.items()}
+        return row
+
+    def get_survey_validators(self, state: dict) -> Tuple[str, datetime]:
+        is_published = state["pk"] in ActiveSurveyModel.get_ids()
+        etag = '"{}-{}-{}-{}"'.format(
+            state["pk"], state["version"], int(is_published),
+            self.request.accepted_renderer.format)
+        last_modified = SurveyModel.last_modified_between(
+            state["updated_at"], state["begin_date"], state["end_date"])
+        return etag, last_modified
+
+
+class FastReadMixin:
+    """Lists and retrieves JSON for non-staff users with ``row_serializer_class``,
+    which represents ``.values()`` rows without serializer field machinery.
+    Retrieve relies on ``SurveyVersionConditionMixin`` to look the row up."""
+    row_serializer_class = None
+
+    def use_row_serializer(self) -> bool:
+        return (
+            self.row_serializer_class is not None
+            and self.action in ("list", "retrieve")
+            and self.format_kwarg is None
+            and self.request.accepted_renderer.format == "json"
+            and self.is_default_representation()
+            and not self.request.user.is_staff)
+
+    def get_queryset(self) -> QuerySet:
+        queryset = super().get_queryset()
+        if self.action == "list" and self.use_row_serializer():
+            queryset = queryset.select_related(None).prefetch_related(None).values(
+                *self.row_serializer_class.values)
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        if self.use_row_serializer():
+            return self.row_serializer_class(
+                *args, context=self.get_serializer_context(), **kwargs)
+        return super().get_serializer(*args, **kwargs)
+
+    def retrieve_unconditionally(self, request, *args, **kwargs) -> HttpResponse:
+        if not self.use_row_serializer():
+            return super().retrieve_unconditionally(request, *args, **kwargs)
+        row = self.get_survey_row(*self.row_serializer_class.values)
+        if row is None or row["survey_state"]["pk"] not in ActiveSurveyModel.get_ids():
+            # Let the full retrieve answer with 404 or 403.
+            return super().retrieve_unconditionally(request, *args, **kwargs)
+        self.validators = self.get_survey_validators(row["survey_state"])
+        return Response(self.get_serializer(row).data)
 
 
 # ---------- SURVEY API ----------
 
 
-class SurveyViewset(PermissedModelViewset):
+class SurveyPagination(KeysetPagination):
+    ordering = ("begin_date", "pk")
+
+
+class SurveyViewset(
+        NestedPageMixin, FastReadMixin, SurveyVersionConditionMixin, PermissedModelViewset):
     queryset = SurveyModel.objects.all()
     serializer_class = SurveyDetailSerializer
+    row_serializer_class = SurveyDetailRowSerializer
+    pagination_class = SurveyPagination
+    prefetch_related = (
+        Prefetch("questions", queryset=limit_per_parent(
+            QuestionModel.objects.all(), "survey", NESTED_COLLECTION_LIMIT + 1)),)
+    prefetching_fields = {"questions_next": "questions"}
     permission_classes = [
         IsAdminUser | AllowListAndRetrieve, DontShowUnpublishedForNonStaff]
 
+    def retrieve_unconditionally(self, request, *args, **kwargs) -> HttpResponse:
+        if request.user.is_staff or not self.is_default_representation():
+            return super().retrieve_unconditionally(request, *args, **kwargs)
+        return Response(self.get_document(SurveyDetailSerializer))
+
+    def get_document(self, serializer_class) -> dict:
+        """Returns the survey rendered by ``serializer_class`` via the cache
+        of documents. Publication is checked on every read. Documents keep the
+        survey state, so validators are set without queries."""
+        def render() -> dict:
+            instance = self.get_object()
+            # Documents are shared by all requests, so they are rendered in
+            # the default representation.
+            serializer = serializer_class(instance, context={
+                **self.get_serializer_context(), "fields": None, "expand": None})
+            document = {
+                field: getattr(instance, field)
+                for field in self.survey_state_fields}
+            document["data"] = serializer.data
+            return document
+
+        document = documents.get_document(
+            self.kwargs["pk"], self.request, serializer_class.__name__, render)
+        self.validators = self.get_survey_validators(document)
+        is_published = document["pk"] in ActiveSurveyModel.get_ids()
+        if not is_published:
+            self.permission_denied(self.request)
+
+        data = dict(document["data"])
+        if "is_published" in data:
+            data["is_published"] = is_published
+        return data
+
+    def get_prefetch_related(self) -> Tuple[str, ...]:
+        if self.action == "bootstrap":
+            return ("questions__response_options",)
+        if self.action == "questions":
+            return ()
+        return super().get_prefetch_related()
+
+    @action(detail=True, permission_classes=[DontShowUnpublishedForNonStaff])
+    def questions(self, request, *args, **kwargs) -> HttpResponse:
+        """Pages questions of the survey, its detail shows the first page only."""
+        survey = self.get_object()
+        return self.get_nested_page(
+            QuestionModel.objects.filter(survey=survey), QuestionShortSerializer)
+
+    @action(detail=True, methods=["post"], permission_classes=[AllowAny])
+    def bootstrap(self, request, *args, **kwargs) -> HttpResponse:
+        """Starts answering of the published survey by a new anonymous
+        respondent: creates an actor with a session and returns the session
+        along with the whole survey."""
+        survey = self.get_document(SurveyDocumentSerializer)
+        with transaction.atomic():
+            actor = ActorModel.objects.create()
+            session = SessionModel.objects.create(actor=actor)
+        session_serializer = SessionShortSerializer(
+            session, context={"request": request})
+        return Response(
+            {"session": session_serializer.data, "survey": survey},
+            status=status.HTTP_201_CREATED)
+
+    @action(detail=True)
+    def results(self, request, *args, **kwargs) -> HttpResponse:
+        """Returns answer counts and percentages per response option."""
+        survey = get_object_or_404(SurveyModel.objects.all(), pk=kwargs["pk"])
+        self.check_object_permissions(request, survey)
+        return Response(survey.get_results())
+
+    @action(detail=True)
+    def export(self, request, *args, **kwargs) -> StreamingHttpResponse:
+        """Streams all answers of the survey as CSV."""
+        survey = get_object_or_404(SurveyModel.objects.all(), pk=kwargs["pk"])
+        self.check_object_permissions(request, survey)
+        response = StreamingHttpResponse(
+            stream_csv(
+                ("session", "actor", "question", "response", "content", "create_time"),
+                survey.get_answer_rows()),
+            content_type="text/csv")
+        response["Content-Disposition"] = \
+            f'attachment; filename="survey-{survey.pk}-answers.csv"'
+        return response
+
 
 # ---------- QUESTION API ----------
 
 
-class QuestionViewset(PermissedModelViewset):
+class QuestionViewset(
+        FastReadMixin, SurveyVersionConditionMixin, PermissedModelViewset):
     queryset = QuestionModel.objects.all()
     serializer_class = QuestionDetailSerializer
+    row_serializer_class = QuestionDetailRowSerializer
+    select_related = ("survey",)
+    prefetch_related = ("response_options",)
     permission_classes = [
         IsAdminUser | AllowListAndRetrieve, DontShowUnpublishedForNonStaff]
 
@@ -43,9 +251,12 @@ class QuestionViewset(PermissedModelViewset):
 # ---------- RESPONSE OPTION API ----------
 
 
-class ResponseOptionViewset(PermissedModelViewset):
+class ResponseOptionViewset(
+        FastReadMixin, SurveyVersionConditionMixin, PermissedModelViewset):
     queryset = ResponseOptionModel.objects.all()
     serializer_class = ResponseOptionDetailSerializer
+    row_serializer_class = ResponseOptionDetailRowSerializer
+    select_related = ("question__survey",)
     permission_classes = [
         IsAdminUser | AllowListAndRetrieve, DontShowUnpublishedForNonStaff]
 
@@ -53,29 +264,58 @@ class ResponseOptionViewset(PermissedModelViewset):
 # ---------- ACTOR API ----------
 
 
-class ActorViewset(GenericViewSet, PermissedRetrieveModelMixin, mixins.CreateModelMixin):
+class ActorViewset(
+        NestedPageMixin, QueryPlanMixin, GenericViewSet,
+        PermissedRetrieveModelMixin, mixins.CreateModelMixin):
     queryset = ActorModel.objects.all()
     serializer_class = ActorDetailSerializer
+    prefetch_related = (
+        Prefetch("sessions", queryset=limit_per_parent(
+            SessionModel.objects.all(), "actor", NESTED_COLLECTION_LIMIT + 1)),)
+    prefetching_fields = {"sessions_next": "sessions"}
     permission_classes = [IsOwnerOrAdmin]
 
+    def get_prefetch_related(self) -> Tuple[str, ...]:
+        if self.action == "sessions":
+            return ()
+        return super().get_prefetch_related()
+
+    @action(detail=True)
+    def sessions(self, request, *args, **kwargs) -> HttpResponse:
+        """Pages sessions of the actor, its detail shows the first page only."""
+        actor = self.get_object()
+        return self.get_nested_page(
+            SessionModel.objects.filter(actor=actor).select_related("actor"),
+            SessionShortSerializer)
+
 
 # ---------- SESSION API ----------
 
 
-class SessionViewset(GenericViewSet, PermissedRetrieveModelMixin, mixins.CreateModelMixin):
+class SessionViewset(
+        QueryPlanMixin, GenericViewSet,
+        PermissedRetrieveModelMixin, mixins.CreateModelMixin):
     queryset = SessionModel.objects.all()
     serializer_class = SessionDetailSerializer
+    expandable_select_related = ("actor",)
+    prefetch_related = ("answer_acts",)
     permission_classes = [AllowAny]
 
 
 # ---------- ANSWER ACT API ----------
 
 
+class AnswerActPagination(KeysetPagination):
+    ordering = ("create_time", "pk")
+
+
 class AnswerActViewset(
-        GenericViewSet, mixins.ListModelMixin,
+        QueryPlanMixin, GenericViewSet, mixins.ListModelMixin,
         mixins.RetrieveModelMixin, mixins.CreateModelMixin):
     queryset = AnswerActModel.objects.all()
     serializer_class = AnswerActDetailSerializer
+    pagination_class = AnswerActPagination
+    expandable_select_related = ("session__actor", "response__question",)
     permission_classes = [AllowAny]
 
     def list(self, request, *args, **kwargs) -> HttpResponse:
@@ -84,13 +324,55 @@ class AnswerActViewset(
         except (WrongQueryParamsException, EmptyQueryParamsException) as e:
             return HttpResponseBadRequest(e)
 
+    def create(self, request, *args, **kwargs) -> HttpResponse:
+        if not ingestion.is_buffered():
+            return super().create(request, *args, **kwargs)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        accepted = ingestion.get_buffer().append(
+            [AnswerActModel(**serializer.validated_data)])
+        return Response({"accepted": accepted}, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=["post"])
+    def bulk(self, request, *args, **kwargs) -> HttpResponse:
+        """Creates all answers of a session passed in one payload:
+        ``{"session": <url>, "answers": [{"response": <url>, "content": ...}]}``.
+        With buffered ingestion answers are journaled and accepted with 202."""
+        serializer = AnswerActBulkSerializer(
+            data=request.data, context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+        if ingestion.is_buffered():
+            session = serializer.validated_data["session"]
+            for answer_act in serializer.validated_data["answers"]:
+                answer_act.session = session
+            accepted = ingestion.get_buffer().append(
+                serializer.validated_data["answers"])
+            return Response({"accepted": accepted}, status=status.HTTP_202_ACCEPTED)
+        try:
+            answer_acts = serializer.save()
+        except NumberExcess as e:
+            return HttpResponseBadRequest(e)
+
+        queryset = AnswerActModel.objects.select_related(*self.get_select_related()).filter(
+            session=serializer.validated_data["session"],
+            response__in=[answer_act.response for answer_act in answer_acts])
+        return Response(
+            self.get_serializer(queryset, many=True).data,
+            status=status.HTTP_201_CREATED)
+
     def get_queryset(self) -> QuerySet:
         queryset: QuerySet = super().get_queryset()
 
-        if len(self.request.query_params) < 1:
+        representation_params = (
+            self.paginator.cursor_query_param, self.paginator.count_query_param,
+            self.fields_query_param, self.expand_query_param)
+        filter_params = [
+            key for key in self.request.query_params.keys()
+            if key not in representation_params]
+        if len(filter_params) < 1:
             raise EmptyQueryParamsException("Here is no query params")
 
-        for key in self.request.query_params.keys():
+        for key in filter_params:
             if key == "actor":
                 queryset = queryset.filter(
                     session__actor=self.request.query_params[key])
@@ -99,9 +381,9 @@ class AnswerActViewset(
                     session=self.request.query_params[key])
             elif key == "question":
                 queryset = queryset.filter(
-                    response__question=self.request.query_params[key])
+                    question=self.request.query_params[key])
             else:
                 raise WrongQueryParamsException(
                     "Request query param isn't accessible.")
 
-        return queryset.order_by(("create_time"))
+        return queryset.order_by("create_time", "pk")
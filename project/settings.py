@@ -56,6 +56,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+
+    'api.survey.utils.middleware.QueryStatsMiddleware',
 ]
 
 ROOT_URLCONF = 'project.urls'
@@ -102,6 +104,44 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+
+# Versions of survey documents and of the set of active surveys are kept in
+# the cache, so it must be shared by all processes which serve the API. Use
+# memcached or Redis when they run on several hosts.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache'),
+    },
+}
+
+# Seconds to keep rendered survey documents (see api.survey.documents).
+SURVEY_DOCUMENT_CACHE_TIMEOUT = 60 * 60
+
+# Seconds to memoize ids of active surveys in a process at most (see
+# api.survey.models.ActiveSurveyModel).
+SURVEY_ACTIVE_IDS_MEMO_TIMEOUT = 10
+
+# Seconds between checks of the shared version of active surveys, changes
+# made by other processes are seen after it at most.
+SURVEY_ACTIVE_IDS_VERSION_CHECK_INTERVAL = 1
+
+# UUID version of primary keys of actors and sessions: 4 (random) or 7
+# (time-ordered, keeps inserts at the right edge of the index).
+SURVEY_UNIQUE_KEY_VERSION = 4
+
+# 'direct' inserts answers in their requests, 'buffered' journals them and
+# answers with 202, inserting them in batches (see api.survey.ingestion).
+ANSWER_INGESTION = {
+    'MODE': 'direct',
+    'JOURNAL': os.path.join(BASE_DIR, 'answers-journal.sqlite3'),
+    'BATCH_SIZE': 500,
+    'FLUSH_INTERVAL': 1.0,
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -135,6 +175,28 @@ USE_L10N = True
 USE_TZ = True
 
 
+# Logging
+# https://docs.djangoproject.com/en/3.2/topics/logging/
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'api.survey.utils.middleware': {
+            'handlers': ['console'],
+            # Tests and benchmarks raise it, per-request stats would flood their output.
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/2.2/howto/static-files/
 
@@ -145,6 +207,9 @@ STATIC_URL = '/static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Overrides settings which suit deployments rather than tests.
+TEST_RUNNER = 'project.test_runner.TestRunner'
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
@@ -0,0 +1,27 @@
+import logging
+
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """Runs tests with settings which suit tests rather than deployments."""
+
+    def setup_test_environment(self, **kwargs) -> None:
+        super().setup_test_environment(**kwargs)
+        self.test_settings = override_settings(
+            # Test users don't need a deliberately slow hasher, it dominates
+            # the run time.
+            PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+            # Parallel test processes have databases of their own, so they
+            # must not share cached documents either.
+            CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+        )
+        self.test_settings.enable()
+        # Per-request stats would flood the output.
+        logging.getLogger('api.survey.utils.middleware').setLevel(logging.WARNING)
+
+    def teardown_test_environment(self, **kwargs) -> None:
+        self.test_settings.disable()
+        super().teardown_test_environment(**kwargs)